@@ -7,6 +7,7 @@ from __future__ import(absolute_import, division, generators,
                        print_function, unicode_literals)
 import os
 import unittest
+import numpy as np
 from xfmod import xfmatgrid
 
 TEST_FREQUENCY = 296500000.0  # 296.5 MHz
@@ -31,6 +32,14 @@ class TestXFMultiPointFrequencies(unittest.TestCase):
         print(self.id())
         self.assertEqual(TEST_FREQUENCY, self.mp_frequencies.frequencies[0])
 
+    def test_frequency_index(self):
+        """Look up the field file index of a frequency."""
+        print(self.id())
+        self.assertEqual(np.float32, self.mp_frequencies.frequencies.dtype)
+        self.assertEqual(0, self.mp_frequencies.frequency_index(TEST_FREQUENCY))
+        with self.assertRaises(ValueError):
+            self.mp_frequencies.frequency_index(2.0 * TEST_FREQUENCY)
+
     def tearDown(self):
         pass
 
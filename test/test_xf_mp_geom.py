@@ -38,6 +38,28 @@ class TestXFMultiPointGeometry(unittest.TestCase):
         self.assertEqual((self.mp_info.num_points, 3),
                          np.shape(self.mp_geom._vertices))
 
+    def test_multipoint_geometry_domains(self):
+        """Test vertex dtype and unique domain index values."""
+        print(self.id())
+        self.assertEqual(np.uint32, self.mp_geom.vertices.dtype)
+        self.assertTrue(np.array_equal(np.unique(self.mp_geom.vertices[:, 0]),
+                                       self.mp_geom.x_domain))
+        self.assertTrue(np.array_equal(np.unique(self.mp_geom.vertices[:, 1]),
+                                       self.mp_geom.y_domain))
+        self.assertTrue(np.array_equal(np.unique(self.mp_geom.vertices[:, 2]),
+                                       self.mp_geom.z_domain))
+
+    def test_multipoint_scatter_index(self):
+        """Scatter index addresses a unique voxel of the cube per vertex."""
+        print(self.id())
+        scatter_index = self.mp_geom.scatter_index
+        self.assertIs(scatter_index, self.mp_geom.scatter_index)
+        self.assertEqual((self.mp_info.num_points,), np.shape(scatter_index))
+        self.assertEqual(self.mp_info.num_points,
+                         len(np.unique(scatter_index)))
+        self.assertLess(np.amax(scatter_index),
+                        np.prod(self.mp_geom.cube_shape))
+
     def tearDown(self):
         pass
 
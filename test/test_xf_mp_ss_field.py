@@ -10,6 +10,7 @@ import re
 import unittest
 import numpy as np
 from xfmod import xfmatgrid
+from xfmod.xfmatgrid import xfmultipoint
 
 TEST_COIL_DIR = os.path.normpath(os.path.join(os.path.realpath(__file__),
                                               '..', '..',
@@ -49,6 +50,32 @@ class TestXFMultiPointFrequencies(unittest.TestCase):
         self.assertEqual(self.mp_info.num_points,
                          np.size(self.mp_ss_field.ss_field))
 
+    def test_ss_bxit_no_memmap(self):
+        """Memory-mapped and buffered readers return the same field."""
+        print(self.id())
+        mp_ss_field_read = xfmatgrid.XFMultiPointSSField(TEST_SS_BXIT,
+                                                         self.mp_info,
+                                                         self.mp_geom,
+                                                         use_memmap=False)
+        self.assertTrue(np.array_equal(self.mp_ss_field.ss_field,
+                                       mp_ss_field_read.ss_field))
+
+    def test_ss_bxit_sparse(self):
+        """Densified sparse field matches the dense field at sensor voxels."""
+        print(self.id())
+        values = xfmultipoint.read_mp_field_values(TEST_SS_BXIT,
+                                                   self.mp_info.num_points)
+        mp_sparse = xfmatgrid.XFMultiPointSparseField(self.mp_geom, values)
+        dense_field = mp_sparse.densify(fill_value=np.nan)
+        self.assertEqual(self.mp_info.num_points, np.sum(mp_sparse.mask))
+        self.assertTrue(np.array_equal(self.mp_ss_field.ss_field[mp_sparse.mask],
+                                       dense_field[mp_sparse.mask]))
+        self.assertTrue(np.all(np.isnan(dense_field[~mp_sparse.mask])))
+        # the mask is shared with the geometry, so it must not be writable
+        self.assertFalse(mp_sparse.mask.flags.writeable)
+        with self.assertRaises(ValueError):
+            mp_sparse.mask[0, 0, 0] = True
+
     def tearDown(self):
         pass
 
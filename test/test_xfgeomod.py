@@ -6,6 +6,8 @@ Test xfgeomod using unittest
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import sys, os
+import shutil
+import tempfile
 import unittest
 from xfmod.xfutils import xf_run_id_to_str, xf_sim_id_to_str
 import numpy as np
@@ -135,6 +137,210 @@ class TestXFGeoMod(unittest.TestCase):
         self.assertEqual(grid_dim, np.shape(self.xf_export.ey_tissue))
         self.assertEqual(grid_dim, np.shape(self.xf_export.ez_tissue))
 
+    def test_edge_run_columns(self):
+        """Bulk read of the Ex edge run block matches the parsed runs."""
+        print(self.id())
+        with open(self.xf_mesh._mesh_input_file_path, 'rb') as file_handle:
+            file_handle.seek(self.xf_mesh._start_ex_edge_run)
+            (x_ind, y_ind, z_ind, stop_ind, mat) = \
+                xfgeomod.xfmesh.read_edge_run_columns(file_handle,
+                                                      mesh_num_ex_edge_runs)
+        self.assertEqual(17, xfgeomod.xfmesh.EDGE_RUN_DTYPE.itemsize)
+        self.assertEqual(mesh_num_ex_edge_runs, len(x_ind))
+        self.assertEqual(np.uint32, stop_ind.dtype)
+        self.assertEqual(np.uint8, mat.dtype)
+        first_run = self.xf_mesh.ex_edge_runs[0]
+        last_run = self.xf_mesh.ex_edge_runs[-1]
+        self.assertEqual((first_run.x_ind, first_run.y_ind, first_run.z_ind,
+                          first_run.stop_ind, first_run.mat),
+                         (x_ind[0], y_ind[0], z_ind[0], stop_ind[0], mat[0]))
+        self.assertEqual((last_run.x_ind, last_run.stop_ind, last_run.mat),
+                         (x_ind[-1], stop_ind[-1], mat[-1]))
+
+    def test_edge_run_table(self):
+        """Edge run tables index, slice and filter by material."""
+        print(self.id())
+        ex_runs = self.xf_mesh.ex_edge_runs
+        self.assertIsInstance(ex_runs, xfgeomod.XFMeshEdgeRunTable)
+        self.assertEqual(mesh_num_ex_edge_runs, len(ex_runs))
+        self.assertEqual('X', ex_runs.run_type)
+        self.assertEqual(17 * mesh_num_ex_edge_runs, ex_runs.nbytes)
+        first_run = next(iter(ex_runs))
+        self.assertEqual(ex_runs[0].stop_ind, first_run.stop_ind)
+        self.assertEqual(10, len(ex_runs[:10]))
+        phantom_runs = ex_runs.with_material(4)
+        self.assertTrue(np.all(phantom_runs.mat == 4))
+        self.assertEqual(np.count_nonzero(ex_runs.mat == 4), len(phantom_runs))
+
+    def test_lazy_edge_runs(self):
+        """Edge runs are decoded per direction on first access."""
+        print(self.id())
+        xf_mesh = xfgeomod.XFMesh(test_project_dir, test_sim_number,
+                                  test_run_number)
+        self.assertIsNone(xf_mesh._ex_edge_runs)
+        self.assertEqual(mesh_num_ey_edge_runs, len(xf_mesh.ey_edge_runs))
+        self.assertIsNone(xf_mesh._ex_edge_runs)
+        self.assertIsNone(xf_mesh._hx_edge_runs)
+        self.assertEqual(mesh_num_hx_edge_runs, xf_mesh.num_hx_edge_runs)
+        self.assertEqual(list(self.xf_mesh.ey_edge_runs.stop_ind),
+                         list(xf_mesh.ey_edge_runs.stop_ind))
+
+    def test_dijk_from_flat_indices(self):
+        """Vectorized flat index decoding matches the scalar decoder."""
+        print(self.id())
+        num_cells = grid_num_x_cells * grid_num_y_cells * grid_num_z_cells
+        flat_indices = np.array([0, 1, grid_num_z_cells, num_cells - 1,
+                                 num_cells, 2 * num_cells + 12345,
+                                 3 * num_cells - 1], dtype=np.uint64)
+        dijk = xfgeomod.xfmesh.dijk_from_flat_indices(flat_indices,
+                                                      grid_num_x_cells,
+                                                      grid_num_y_cells,
+                                                      grid_num_z_cells)
+        for (index, flat_index) in enumerate(flat_indices.tolist()):
+            self.assertEqual(
+                xfgeomod.xfmesh.dijk_from_flat_index(flat_index,
+                                                     grid_num_x_cells,
+                                                     grid_num_y_cells,
+                                                     grid_num_z_cells),
+                tuple(int(values[index]) for values in dijk))
+
+    def test_iter_edge_runs(self):
+        """Streamed edge run batches concatenate to the full tables."""
+        print(self.id())
+        for name in ('ex', 'ey', 'ez', 'hx', 'hy', 'hz'):
+            batches = list(self.xf_mesh.iter_edge_runs(name[0], name[1],
+                                                       batch_runs=1000))
+            self.assertTrue(all(len(batch) <= 1000 for batch in batches))
+            table = getattr(self.xf_mesh, name + '_edge_runs')
+            self.assertEqual(len(table), sum(len(batch) for batch in batches))
+            if batches:
+                self.assertTrue(np.array_equal(
+                    table.stop_ind,
+                    np.concatenate([batch.stop_ind for batch in batches])))
+
+    def test_edge_run_linear_indices(self):
+        """Rasterized edge indices match expanding each run in turn."""
+        print(self.id())
+        shape = (grid_num_x_cells + 1, grid_num_y_cells + 1,
+                 grid_num_z_cells + 1)
+        table = self.xf_mesh.ey_edge_runs[:1000]
+        (indices, mats) = table.linear_indices(shape)
+        expected_indices = []
+        expected_mats = []
+        for edge_run in table:
+            for index in range(edge_run.y_ind, edge_run.stop_ind):
+                expected_indices.append(np.ravel_multi_index(
+                    (edge_run.x_ind, index, edge_run.z_ind), shape))
+                expected_mats.append(edge_run.mat)
+        self.assertEqual(expected_indices, indices.tolist())
+        self.assertEqual(expected_mats, mats.tolist())
+
+    def test_mat_ids(self):
+        """Mesh properties are looked up from compact material ID volumes."""
+        print(self.id())
+        for direction in ('ex', 'ey', 'ez'):
+            mat_ids = self.xf_export.mat_ids(direction)
+            self.assertTrue(mat_ids.dtype in (np.uint8, np.uint16))
+            self.assertEqual(np.shape(self.xf_export.ex_sigma),
+                             np.shape(mat_ids))
+            for property_name in ('density', 'sigma', 'epsilon_r', 'tissue'):
+                lut = self.xf_export.property_lut(direction, property_name)
+                self.assertTrue(np.array_equal(
+                    lut[mat_ids],
+                    self.xf_export.mesh_property(direction, property_name),
+                    equal_nan=True))
+        pec_lut = self.xf_export.property_lut('ex', 'epsilon_r')
+        self.assertEqual(0.0, pec_lut[1])
+        # free space has zero density, PEC none
+        density_lut = self.xf_export.property_lut('ex', 'density')
+        self.assertEqual(0.0, density_lut[0])
+        self.assertTrue(np.isnan(density_lut[1]))
+        # edges without an edge run are free space without density
+        unmeshed = len(self.xf_geom.load_materials())
+        self.assertTrue(np.isnan(density_lut[unmeshed]))
+        sigma_lut = self.xf_export.property_lut('ex', 'sigma')
+        self.assertEqual(sigma_lut[0], sigma_lut[unmeshed])
+        # property volumes are cached read-only
+        self.assertIs(self.xf_export.ex_sigma, self.xf_export.ex_sigma)
+        self.assertFalse(self.xf_export.ex_sigma.flags.writeable)
+
+    def test_mesh_data_directions(self):
+        """Only the requested directions and properties are built."""
+        print(self.id())
+        xf_export = xfgeomod.XFGridExporter(self.xf_geom, self.xf_mesh,
+                                            directions=['ex', 'hz'])
+        self.assertTrue(xf_export.mat_ids('ey') is None)
+        mesh_dict = xf_export.mesh_data(properties=['sigma', 'tissue'])
+        self.assertEqual(['MeshExSigma', 'MeshExTissue', 'MeshHzTissue'],
+                         sorted(mesh_dict))
+        self.assertEqual(np.shape(self.xf_export.ex_sigma),
+                         np.shape(mesh_dict['MeshHzTissue']))
+        self.assertTrue(np.array_equal(xf_export.hz_tissue,
+                                       mesh_dict['MeshHzTissue']))
+        self.assertRaises(ValueError, xf_export.property_lut, 'hz', 'sigma')
+        # H edges are only exported when asked for
+        self.assertEqual(['ex', 'ey', 'ez'], self.xf_export.directions)
+
+    def test_grid_coods(self):
+        """Grid coordinates are cached read-only arrays reset by setters."""
+        print(self.id())
+        grid_data = self.xf_geom.grid_data
+        x_coods = grid_data.x_coods()
+        self.assertTrue(x_coods is grid_data.x_coods())
+        self.assertFalse(x_coods.flags.writeable)
+        self.assertEqual(grid_data.num_x_cells, len(x_coods))
+        self.assertEqual(grid_data.origin[0], x_coods[0])
+        grid_data.x_deltas = grid_data.x_deltas
+        self.assertFalse(x_coods is grid_data.x_coods())
+        self.assertTrue(np.array_equal(x_coods, grid_data.x_coods()))
+
+    def test_mesh_stats(self):
+        """Mesh statistics agree with the edge run tables."""
+        print(self.id())
+        mesh_stats = xfgeomod.XFMeshStats(self.xf_mesh, batch_runs=1000)
+        self.assertEqual(self.xf_mesh.num_ex_edge_runs,
+                         mesh_stats.run_counts['ex'])
+        table = self.xf_mesh.ex_edge_runs
+        lengths = table.stop_ind.astype(np.int64) - table.x_ind
+        self.assertEqual(int(lengths.sum()), int(mesh_stats.edge_counts('ex').sum()))
+        self.assertEqual(len(table), int(mesh_stats.run_length_histogram('ex').sum()))
+        bounding_boxes = mesh_stats.bounding_boxes('ex')
+        for mat in np.unique(table.mat).tolist():
+            runs = table.with_material(mat)
+            self.assertEqual(int(runs.x_ind.min()), bounding_boxes[mat][0][0])
+            self.assertEqual(int(runs.stop_ind.max()) - 1,
+                             bounding_boxes[mat][1][0])
+
+    def test_mesh_cache(self):
+        """Edge runs loaded from the on-disk cache match the decoded runs."""
+        print(self.id())
+        cache_dir = tempfile.mkdtemp()
+        try:
+            for _ in range(2):
+                xf_mesh = xfgeomod.XFMesh(test_project_dir, test_sim_number,
+                                          test_run_number, cache_dir=cache_dir)
+                for name in ('ex', 'ey', 'ez', 'hx', 'hy', 'hz'):
+                    cached = getattr(xf_mesh, name + '_edge_runs')
+                    decoded = getattr(self.xf_mesh, name + '_edge_runs')
+                    for column in ('x_ind', 'y_ind', 'z_ind', 'stop_ind', 'mat'):
+                        self.assertTrue(np.array_equal(getattr(decoded, column),
+                                                       getattr(cached, column)))
+        finally:
+            shutil.rmtree(cache_dir)
+
+        # directions are cached as they are used
+        cache_dir = tempfile.mkdtemp()
+        try:
+            xf_mesh = xfgeomod.XFMesh(test_project_dir, test_sim_number,
+                                      test_run_number, cache_dir=cache_dir)
+            xf_mesh.ex_edge_runs
+            sections = [entry.rsplit('-', 1)[1]
+                        for entry in os.listdir(cache_dir)
+                        if not entry.endswith('manifest.json')]
+            self.assertEqual(['ex'], sections)
+        finally:
+            shutil.rmtree(cache_dir)
+
     def test_xfgeomod_materials(self):
         """Test the xfgeomod materials to match list."""
         print(self.id())
@@ -145,6 +351,131 @@ class TestXFGeoMod(unittest.TestCase):
         # verify the tissue properties of the materials
         self.assertEqual([0, 0, 1], [mat.tissue for mat in self.xf_export._materials_list[2:]])
 
+    def test_geometry_single_pass(self):
+        """Test materials and grid deltas come from one parse of the file."""
+        print(self.id())
+        materials_list = self.xf_geom.load_materials()
+        self.assertEqual(['ElectricFreeSpace', 'ElectricPerfectConductor'],
+                         [mat.name for mat in materials_list[:2]])
+        self.assertEqual(mesh_materials,
+                         [mat.name for mat in materials_list[2:]])
+        # callers get their own list
+        materials_list.pop()
+        self.assertEqual(len(mesh_materials) + 2,
+                         len(self.xf_geom.load_materials()))
+        # delta tables start at cell 0
+        for deltas in (self.xf_geom.grid_data.x_deltas,
+                       self.xf_geom.grid_data.y_deltas,
+                       self.xf_geom.grid_data.z_deltas):
+            self.assertEqual(0, int(deltas[0][0]))
+
+    def test_material_table(self):
+        """Test the material table columns match the material list."""
+        print(self.id())
+        materials_list = self.xf_geom.load_materials()
+        material_table = self.xf_geom.material_table
+        self.assertIsInstance(material_table, xfgeomod.XFMaterialTable)
+        self.assertEqual(len(materials_list), len(material_table))
+        self.assertEqual([mat.name for mat in materials_list],
+                         material_table.names)
+        self.assertEqual([mat.tissue for mat in materials_list[2:]],
+                         material_table.tissue[2:].tolist())
+        self.assertTrue(np.allclose(
+            [mat.density for mat in materials_list[2:]],
+            material_table.density[2:]))
+        # free space and PEC rows
+        self.assertEqual(0.0, material_table.density[0])
+        self.assertTrue(np.isnan(material_table.density[1]))
+        self.assertEqual([False, True], material_table.pec[:2].tolist())
+        self.assertEqual(0.0, material_table.epsilon_r[1])
+        self.assertEqual(materials_list[0].conductivity,
+                         material_table.conductivity[1])
+        self.assertTrue(np.array_equal(material_table.density,
+                                       self.xf_export.property_lut(
+                                           'ex', 'density')[
+                                               :len(material_table)],
+                                       equal_nan=True))
+
+    def test_material_numbers(self):
+        """Test materials are placed at their material_number."""
+        print(self.id())
+        material_block = ("begin_<normal_electric> %s\n"
+                          "material_number %d\n"
+                          "conductivity %g\n"
+                          "permittivity %g\n"
+                          "density %g\n"
+                          "begin_<TemperatureRiseMaterialParameters>\n"
+                          "tissue 1\n"
+                          "end_<TemperatureRiseMaterialParameters>\n"
+                          "end_<normal_electric>\n")
+        project_dir = tempfile.mkdtemp()
+        try:
+            run_dir = os.path.join(project_dir, 'Simulations',
+                                   xf_sim_id_to_str(1), xf_run_id_to_str(1))
+            os.makedirs(run_dir)
+            with open(os.path.join(run_dir, 'geometry.input'), 'w') as f:
+                f.write("begin_<electricfreespace> ElectricFreeSpace\n"
+                        "material_number 0\n"
+                        "conductivity 0\n"
+                        "permittivity 1\n"
+                        "density 0\n"
+                        "end_<electricfreespace>\n"
+                        "begin_<electricperfectconductor> PEC\n"
+                        "material_number 1\n"
+                        "end_<electricperfectconductor>\n")
+                f.write(material_block % ('Muscle', 4, 0.8, 58, 1050))
+                f.write(material_block % ('Skin', 2, 0.5, 40.5, 1100))
+            xf_geom = xfgeomod.XFGeometry(project_dir, 1, 1)
+        finally:
+            shutil.rmtree(project_dir)
+        materials_list = xf_geom.load_materials()
+        self.assertEqual(5, len(materials_list))
+        self.assertEqual('Skin', materials_list[2].name)
+        self.assertTrue(materials_list[3] is None)
+        self.assertEqual('Muscle', materials_list[4].name)
+        material_table = xf_geom.material_table
+        self.assertEqual(['ElectricFreeSpace', 'PEC', 'Skin', '', 'Muscle'],
+                         material_table.names)
+        self.assertEqual([0.5, 0.8],
+                         material_table.conductivity[[2, 4]].tolist())
+        self.assertTrue(np.isnan(material_table.density[3]))
+        self.assertEqual([0, 0, 1, 0, 1], material_table.tissue.tolist())
+
+    def test_geometry_cache(self):
+        """Test parsed geometry is shared but each XFGeometry has copies."""
+        print(self.id())
+        xf_geom = xfgeomod.XFGeometry(test_project_dir, test_sim_number,
+                                      test_run_number)
+        self.assertTrue(xf_geom.material_table is self.xf_geom.material_table)
+        self.assertFalse(xf_geom.grid_data is self.xf_geom.grid_data)
+        self.assertEqual(self.xf_geom.grid_data.x_deltas,
+                         xf_geom.grid_data.x_deltas)
+        xf_geom.load_materials()[2].name = 'renamed'
+        self.assertEqual(mesh_materials[0],
+                         self.xf_geom.load_materials()[2].name)
+        # in-place edits of the delta tables stay with their instance
+        x_delta = self.xf_geom.grid_data.x_deltas[0][1]
+        xf_geom.grid_data.x_deltas[0][1] = 2.0 * x_delta
+        self.assertEqual(x_delta, xfgeomod.XFGeometry(
+            test_project_dir, test_sim_number,
+            test_run_number).grid_data.x_deltas[0][1])
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            xfgeomod.xfgeometry.clear_geometry_cache()
+            xfgeomod.XFGeometry(test_project_dir, test_sim_number,
+                                test_run_number, cache_dir=cache_dir)
+            xfgeomod.xfgeometry.clear_geometry_cache()
+            cached = xfgeomod.XFGeometry(test_project_dir, test_sim_number,
+                                         test_run_number, cache_dir=cache_dir)
+            self.assertEqual([mat.name for mat in
+                              self.xf_geom.load_materials()],
+                             [mat.name for mat in cached.load_materials()])
+            self.assertEqual(self.xf_geom.grid_data.z_deltas,
+                             cached.grid_data.z_deltas)
+        finally:
+            shutil.rmtree(cache_dir)
+
     def tearDown(self):
         pass
 
@@ -239,18 +239,30 @@ class TestXFMatGrid(unittest.TestCase):
         print(self.id())
         self.assertEqual(TEST_COIL_DIR, self.field_nugrid.project_dir)
         self.assertEqual(MULTIPOINT_SENSOR_FILE,
-                         self.field_nugrid._mp_ss_info_file[0])
-        self.assertEqual('Rmpt', self.field_nugrid._mp_ss_info.header)
+                         self.field_nugrid.mp_ss_info_file)
+        self.assertEqual('Rmpt', self.field_nugrid.mp_ss_info.header)
 
     def test_frequencies_bin(self):
         print(self.id())
         self.assertEqual(TEST_FREQUENCY,
-                         self.field_nugrid._mp_freq._frequencies[0])
+                         self.field_nugrid.frequencies[0])
 
     def test_field_data(self):
         print(self.id())
         self.assertEqual(TEST_MULTIPOINT_DIRS,
-                         self.field_nugrid._mp_field_types)
+                         self.field_nugrid.mp_field_types)
+
+    def test_lazy_construction(self):
+        """Sensor and grid data are not loaded until first requested."""
+        print(self.id())
+        field_nugrid = xfmatgrid.XFFieldNonUniformGrid(TEST_COIL_DIR, 1, 1,
+                                                       MP_SENSOR_NAME)
+        self.assertIsNone(field_nugrid._mp_ss_info)
+        self.assertIsNone(field_nugrid._mp_geom)
+        self.assertIsNone(field_nugrid._xf_grid)
+        self.assertEqual(TEST_MULTIPOINT_DIRS, field_nugrid.mp_field_types)
+        self.assertIsNone(field_nugrid._mp_geom)
+        self.assertIsNone(field_nugrid._xf_grid)
 
     def test_ranges(self):
         """Test x-, y-, and z-dimenions."""
@@ -259,6 +271,92 @@ class TestXFMatGrid(unittest.TestCase):
         self.assertTrue(np.allclose(Y_DIM_VALS, self.field_nugrid.ydim))
         self.assertTrue(np.allclose(Z_DIM_VALS, self.field_nugrid.zdim))
 
+    def test_field_data_complex64(self):
+        """Single precision field data matches double precision values."""
+        print(self.id())
+        field_c128 = self.field_nugrid.ss_field_data(self.fieldName, 'x')
+        field_c64 = self.field_nugrid.ss_field_data(self.fieldName, 'x',
+                                                    dtype=np.complex64)
+        self.assertEqual(np.complex128, field_c128.dtype)
+        self.assertEqual(np.complex64, field_c64.dtype)
+        self.assertTrue(np.array_equal(field_c128, field_c64))
+
+    def test_field_data_cache(self):
+        """Repeated field requests are served from the field cache."""
+        print(self.id())
+        field_data = self.field_nugrid.ss_field_data(self.fieldName, 'x',
+                                                     copy=False)
+        self.assertIs(field_data,
+                      self.field_nugrid.ss_field_data(self.fieldName, 'x',
+                                                      copy=False))
+        self.assertFalse(field_data.flags.writeable)
+        # the default is a writable copy of the cached cube
+        field_copy = self.field_nugrid.ss_field_data(self.fieldName, 'x')
+        self.assertIsNot(field_data, field_copy)
+        self.assertTrue(field_copy.flags.writeable)
+        field_copy *= 2.0
+        self.assertTrue(np.array_equal(
+            field_data, self.field_nugrid.ss_field_data(self.fieldName, 'x')))
+        self.field_nugrid.clear_cache()
+        self.assertIsNot(field_data,
+                         self.field_nugrid.ss_field_data(self.fieldName, 'x',
+                                                         copy=False))
+
+    def test_field_data_invalid_type(self):
+        """An unknown data type raises instead of returning stale data."""
+        print(self.id())
+        self.field_nugrid.ss_field_data(self.fieldName, 'x', copy=False)
+        with self.assertRaises(ValueError):
+            self.field_nugrid.ss_field_data('Q', 'x')
+
+    def test_field_box(self):
+        """Box and point samples match the full field cube."""
+        print(self.id())
+        field_data = self.field_nugrid.ss_field_data(self.fieldName, 'y')
+        self.field_nugrid.clear_cache()
+        box_data = self.field_nugrid.ss_field_box(self.fieldName, 'y',
+                                                  (10, 20, 30), (14, 22, 35))
+        self.assertTrue(np.array_equal(field_data[10:14, 20:22, 30:35],
+                                       box_data))
+        self.assertEqual(field_data[12, 21, 33],
+                         self.field_nugrid.ss_field_at_index(self.fieldName,
+                                                             'y',
+                                                             (12, 21, 33)))
+        # components sampled at the same box share one vertex scan
+        (rows, offsets) = self.field_nugrid.mp_geometry.vertex_rows_in_box(
+            (12, 21, 33), (13, 22, 34))
+        self.assertIs(rows, self.field_nugrid.mp_geometry.vertex_rows_in_box(
+            (12, 21, 33), (13, 22, 34))[0])
+        self.assertEqual([[0, 0, 0]], offsets.tolist())
+
+    def test_field_box_cache(self):
+        """Box samples do not depend on whether the cube is cached."""
+        print(self.id())
+        stop = self.field_nugrid.mp_geometry.cube_shape
+        self.field_nugrid.clear_cache()
+        cold = self.field_nugrid.ss_field_box(self.fieldName, 'x', (0, 0, 0),
+                                              stop)
+        self.field_nugrid.ss_field_data(self.fieldName, 'x', copy=False)
+        warm = self.field_nugrid.ss_field_box(self.fieldName, 'x', (0, 0, 0),
+                                              stop)
+        self.assertTrue(np.array_equal(cold, warm, equal_nan=True))
+
+    def test_field_cube(self):
+        """Each frequency slice of the field cube matches ss_field_data."""
+        print(self.id())
+        field_cube = self.field_nugrid.ss_field_cube(self.fieldName, 'x')
+        frequencies = self.field_nugrid.frequencies
+        self.assertEqual(len(frequencies), field_cube.shape[0])
+        for index, frequency in enumerate(frequencies):
+            field_data = self.field_nugrid.ss_field_data(self.fieldName, 'x',
+                                                         frequency=frequency)
+            self.assertTrue(np.array_equal(field_data, field_cube[index]))
+        # empty frequency selections keep the trailing cube shape
+        cube_shape = self.field_nugrid.mp_geometry.cube_shape
+        self.assertEqual((0,) + cube_shape, field_cube[5:5].shape)
+        self.assertEqual((0, cube_shape[1]), field_cube[5:5, 2, :, 3].shape)
+        self.assertEqual(field_cube.dtype, field_cube[5:5].dtype)
+
     def test_write_matfile(self):
         """Write and verify the x-, y-, and z-dimension values."""
         print(self.id())
@@ -8,7 +8,10 @@ from __future__ import (absolute_import, division, generators,
 
 import sys
 import os
+import shutil
+import tempfile
 import unittest
+import numpy as np
 import xfmod.xfutils as xfutils
 
 class TestXFUtils(unittest.TestCase):
@@ -57,6 +60,98 @@ class TestXFUtils(unittest.TestCase):
         self.assertEqual(1, xfutils.xf_run_str_to_int('Run0001'))
         self.assertEqual(9999, xfutils.xf_run_str_to_int('Run9999'))
 
+    def test_xf_is_string(self):
+        """Check that str and unicode literals are strings, lists are not."""
+        print(self.id())
+        self.assertTrue(xfutils.xf_is_string('ex'))
+        self.assertTrue(xfutils.xf_is_string(u'ex'))
+        self.assertFalse(xfutils.xf_is_string(['ex']))
+        self.assertFalse(xfutils.xf_is_string(None))
+
+    def test_lru_cache_byte_budget(self):
+        """Least recently used arrays are evicted over the byte budget."""
+        print(self.id())
+        cache = xfutils.XFLRUCache(max_bytes=200)
+        cache.put('a', np.zeros(10))
+        cache.put('b', np.zeros(10))
+        self.assertEqual(160, cache.nbytes)
+        cache.get('a')
+        cache.put('c', np.zeros(10))
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        cache.put('d', np.zeros(100))
+        self.assertFalse('d' in cache)
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.nbytes)
+
+    def test_array_cache(self):
+        """Arrays round trip through the on-disk cache keyed by file digest."""
+        print(self.id())
+        cache_dir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(cache_dir, 'source.bin')
+            with open(source, 'wb') as source_file:
+                source_file.write(b'mesh')
+            cache = xfutils.XFArrayCache(os.path.join(cache_dir, 'cache'), 'test')
+            key = cache.source_key(source)
+            self.assertEqual(xfutils.xf_file_digest(source), key)
+            self.assertTrue(cache.load(key) is None)
+            cache.save(key, {'values': np.arange(5, dtype=np.uint32)})
+            arrays = cache.load(key)
+            self.assertEqual([0, 1, 2, 3, 4], arrays['values'].tolist())
+            self.assertEqual(np.uint32, arrays['values'].dtype)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_cache_prune(self):
+        """Entries of replaced or removed source files are pruned."""
+        print(self.id())
+        cache_dir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(cache_dir, 'source.bin')
+            with open(source, 'wb') as source_file:
+                source_file.write(b'mesh')
+            cache = xfutils.XFArrayCache(os.path.join(cache_dir, 'cache'), 'test')
+            old_key = cache.source_key(source)
+            cache.save(old_key + '-ex', {'values': np.arange(5)})
+            # a changed source drops the entries of its old contents
+            with open(source, 'wb') as source_file:
+                source_file.write(b'new mesh')
+            os.utime(source, (0, 0))
+            key = cache.source_key(source)
+            self.assertTrue(cache.load(old_key + '-ex') is None)
+            cache.save(key + '-ex', {'values': np.arange(5)})
+            cache.prune()
+            self.assertFalse(cache.load(key + '-ex') is None)
+            cache.prune(max_bytes=0)
+            self.assertTrue(cache.load(key + '-ex') is None)
+            cache.save(key + '-ex', {'values': np.arange(5)})
+            os.remove(source)
+            cache.prune()
+            self.assertTrue(cache.load(key + '-ex') is None)
+            cache.clear()
+            self.assertEqual([], os.listdir(cache.cache_dir))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_json_cache(self):
+        """Parsed values round trip through the on-disk JSON cache."""
+        print(self.id())
+        cache_dir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(cache_dir, 'source.txt')
+            with open(source, 'w') as source_file:
+                source_file.write('geometry')
+            cache = xfutils.XFJsonCache(os.path.join(cache_dir, 'cache'),
+                                        'test')
+            key = cache.source_key(source)
+            self.assertTrue(cache.load(key) is None)
+            cache.save(key, {'rows': [1, 2.5], 'name': 'Muscle'})
+            self.assertEqual({'rows': [1, 2.5], 'name': 'Muscle'},
+                             cache.load(key))
+        finally:
+            shutil.rmtree(cache_dir)
 
     def tearDown(self):
         pass
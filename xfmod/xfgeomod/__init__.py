@@ -3,8 +3,10 @@ Python module to read XFdtd material, gridding, and meshing files.
 """
 #__all__ = ['xfmaterial', 'xfgeometry']
 from .xfmaterial import XFMaterial
+from .xfmaterialtable import XFMaterialTable
 from .xfgriddata import XFGridData
-from .xfmesh import XFMesh
+from .xfmesh import XFMesh, XFMeshEdgeRunTable
 from .xfgridexporter import XFGridExporter
 from .xfgeometry import XFGeometry
+from .xfmeshstats import XFMeshStats
 
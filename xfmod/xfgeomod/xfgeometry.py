@@ -7,98 +7,92 @@ and properties.
 from __future__ import (absolute_import, division, generators,
                         print_function, unicode_literals)
 
-import re
 import os
-from xfmod.xfutils import xf_run_id_to_str, xf_sim_id_to_str
+import copy
+from xfmod.xfutils import (xf_run_id_to_str, xf_sim_id_to_str, XFLRUCache,
+                           XFJsonCache, xf_cache_dir, xf_file_digest)
 from xfmod.xfgeomod import XFGridData, XFMaterial
+from xfmod.xfgeomod.xfmaterialtable import (XFMaterialTable, MATERIAL_COLUMNS,
+                                            FREE_SPACE_MATERIAL, PEC_MATERIAL)
 
-# Regex expressions
-_MAT_FREESPACE_PATTERN = r'^begin_<electricfreespace> ' + \
-                         r'(ElectricFreeSpace)\n' + \
-                         r'material_number (\d+)\n' + \
-                         r'conductivity ([\d\-eE.]*)\n' + \
-                         r'permittivity ([\d\-eE.]*)\n' + \
-                         r'density ([\d\-eE.]*)\n' + \
-                         r'water_ratio ([\d\-eE.]*)\n' + \
-                         r'end_<electricfreespace>'
-
-_MAT_PEC_PATTERN = r'^begin_<electricperfectconductor> ' + \
-                   r'(ElectricPerfectConductor)\n' + \
-                   r'material_number (\d+)\n' + \
-                   r'end_<electricperfectconductor>'
-#r'(["\w\s\d\-\(\)]+)\s*\n' + \
-_MAT_NORMALELECTRIC_PATTERN = r'^begin_<normal_electric>\s*' + \
-                              r'(.*)\n' + \
-                              r'material_number (\d+)\n' + \
-                              r'conductivity ([\d\-eE.]*)\n'+ \
-                              r'uncorrected_conductivity ' + \
-                              r'([\d\-eE.]*)\n' + \
-                              r'permittivity ([\d\-eE.]*)\n' + \
-                              r'(effectiveConductivity\s*' +\
-                              r'[\d\-eE.]*\n)?' + \
-                              r'(effectiveUncorrectedConductivity\s*' +\
-                              r'[\d\-eE.]*\n)?' + \
-                              r'(effectiveRelativePermittivity\s*' + \
-                              r'[\d\-eE.]*\n)?' + \
-                              r'density ([\d\-eE.]*)\n' + \
-                              r'water_ratio ([\d\-eE.]*)\nbegin_' + \
-                              r'<TemperatureRiseMaterial' + \
-                              r'Parameters>\s*\n' + \
-                              r'heat_capacity ([\d\-eE.]*)\n' + \
-                              r'thermal_conductivity ([\d\-eE.]*)\n' + \
-                              r'perfusion_rate ([\d\-eE.]*)\n' + \
-                              r'metabolic_heat ([\d\-eE.]*)\n' + \
-                              r'tissue (\d+)\nend_' + \
-                              r'<TemperatureRiseMaterialParameters>' + \
-                              r'\s*\nend_<normal_electric>'
-
-_GRID_DEFINITION = r'^begin_<GridDefinition>\s*\n' + \
-                   r'GridOriginInMeters\s*' + \
-                   r'([\d\-.]+) ([\d\-.]+) ([\d\-.]+)\n' + \
-                   r'NumberOfCellsInX (\d+)\s*\n' + \
-                   r'NumberOfCellsInY (\d+)\s*\n' + \
-                   r'NumberOfCellsInZ (\d+)\s*\n' + \
-                   r'end_<GridDefinition>'
-
-_GRID_BEGIN_DELX = r'begin_<DelX>\s*'
-_GRID_END_DELX = r'end_<DelX>\s*'
-_GRID_BEGIN_DELY = r'begin_<DelY>\s*'
-_GRID_END_DELY = r'end_<DelY>\s*'
-_GRID_BEGIN_DELZ = r'begin_<DelZ>\s*'
-_GRID_END_DELZ = r'end_<DelZ>\s*'
-_GRID_DELTA = r'(\d*)\s([\d\-.]*)\n'
+# On-disk cache entry kind for parsed geometry; bump if the layout changes
+GEOMETRY_CACHE_KIND = 'xfgeometry-3'
+# Number of distinct geometry.input files kept parsed in the process
+GEOMETRY_CACHE_ITEMS = 16
+# Number of geometry.input paths whose content digest is remembered; every
+# simulation of a project has its own path to the same contents
+FILE_KEY_CACHE_ITEMS = 256
+
+# parsed geometry of each geometry.input content digest
+_GEOMETRY_CACHE = XFLRUCache(max_items=GEOMETRY_CACHE_ITEMS)
+# content digest of each (file, size, mtime)
+_FILE_KEYS = XFLRUCache(max_items=FILE_KEY_CACHE_ITEMS)
+
+_BEGIN = 'begin_<'
+_END = 'end_<'
+# normal electric material entries required to build an XFMaterial
+_NORMAL_ELECTRIC_KEYS = ('conductivity', 'permittivity', 'density', 'tissue')
+# geometry.input entry of each material table column
+_MATERIAL_COLUMN_KEYS = dict((column, column) for column in MATERIAL_COLUMNS)
+_MATERIAL_COLUMN_KEYS['epsilon_r'] = 'permittivity'
+# fields of the grid data and materials stored in the on-disk cache
+_GRID_DATA_FIELDS = ('origin', 'num_x_cells', 'num_y_cells', 'num_z_cells',
+                     'x_deltas', 'y_deltas', 'z_deltas')
+_MATERIAL_FIELDS = ('name', 'conductivity', 'density', 'epsilon_r', 'tissue')
+
+class _GeometryBlock(object):
+    """A begin_<tag> name ... end_<tag> block of geometry.input."""
+    def __init__(self, tag, name):
+        self.tag = tag
+        self.name = name
+        self.entries = dict()
+        self.rows = []
+
+def _read_blocks(file_handle):
+    """
+    Walk the begin_<tag>/end_<tag> blocks of geometry.input in one pass and
+    yield each top level block as it ends.  Entry lines ("key value ...")
+    of a block and of its nested blocks are collected in entries (first
+    occurrence wins) and as split rows.
+    """
+    stack = []
+    for line in file_handle:
+        line = line.rstrip('\r\n')
+        if line.startswith(_BEGIN):
+            (tag, _, name) = line[len(_BEGIN):].partition('>')
+            stack.append(_GeometryBlock(tag, name.lstrip()))
+        elif line.startswith(_END):
+            if not stack:
+                continue
+            block = stack.pop()
+            if stack:
+                # fold nested blocks (e.g. temperature rise parameters)
+                for (key, value) in block.entries.items():
+                    stack[-1].entries.setdefault(key, value)
+            else:
+                yield block
+        elif stack:
+            fields = line.split()
+            if fields:
+                stack[-1].entries.setdefault(fields[0], fields[1:])
+                stack[-1].rows.append(fields)
 
 class XFGeometry(object):
-    """A class to hold coil geometry info."""
-    NAME = 0
-    MATERIAL_NUMBER = 1
-    CONDUCTIVITY = 2
-    PERMITTIVITY = 4
-    DENSITY = 8
-    WATER_RATIO = 9
-    HEAT_CAPACITY = 10
-    THERMAL_CONDUCTIVITY = 11
-    PERFUSION_RATE = 12
-    METABOLIC_HEAT = 13
-    TISSUE = 14
-
-    def __init__(self, xf_project_dir, sim_id, run_id):
-        # compile patterns
-        self._mat_free_space = re.compile(_MAT_FREESPACE_PATTERN, \
-                                              re.MULTILINE)
-        self._mat_pec = re.compile(_MAT_PEC_PATTERN, re.MULTILINE)
-        self._mat_norm_electric = re.compile(_MAT_NORMALELECTRIC_PATTERN,\
-                                            re.MULTILINE)
-        self._grid_definition = re.compile(_GRID_DEFINITION, \
-                                           re.MULTILINE)
-        self._begin_delx = re.compile(_GRID_BEGIN_DELX)
-        self._end_delx = re.compile(_GRID_END_DELX)
-        self._begin_dely = re.compile(_GRID_BEGIN_DELY)
-        self._end_dely = re.compile(_GRID_END_DELY)
-        self._begin_delz = re.compile(_GRID_BEGIN_DELZ)
-        self._end_delz = re.compile(_GRID_END_DELZ)
-        self._grid_delta = re.compile(_GRID_DELTA, re.MULTILINE)
+    """
+    A class to hold coil geometry info.
+
+    geometry.input is read once, on construction, by a single pass over its
+    begin_<...>/end_<...> blocks that fills the grid definition, the delta
+    tables, the materials and the material table.
 
+    Parsed geometry is cached for the whole process, keyed by the contents
+    of geometry.input, so the identical files of the simulations of a
+    multi-channel project are parsed once.  Each XFGeometry gets its own
+    copies of the grid data and materials.  If cache_dir (or the
+    XFMOD_CACHE_DIR environment variable) is set, parsed geometry is also
+    stored there for later processes.
+    """
+    def __init__(self, xf_project_dir, sim_id, run_id, cache_dir=None):
         # file info
         self._geometry_input_file_path = os.path.join(xf_project_dir,
                                                       r'Simulations',
@@ -107,73 +101,193 @@ class XFGeometry(object):
                                                       r'geometry.input')
 
         # geometry info
-        self._geom_info = ''
         self._materials = []
+        self._material_table = XFMaterialTable([], [], [])
         self.grid_data = XFGridData()
-        self._load_grid_data()
+        self._load_geometry(xf_cache_dir(cache_dir))
 
     def load_materials(self):
-        """Load materials from material.input."""
-        if os.path.exists(self._geometry_input_file_path):
-            self._materials = []
-            file_handle = open(self._geometry_input_file_path, 'r')
-            self._geom_info = file_handle.read()
-            file_handle.close()
-            # load free space (always material 0)
-            mat_fs = self._mat_free_space.search(self._geom_info)
-            self._materials.append(XFMaterial())
-            self._materials[0].name = mat_fs.group(1)
-            self._materials[0].conductivity = float(mat_fs.group(3))
-            self._materials[0].epsilon_r = float(mat_fs.group(4))
-            self._materials[0].density = float(mat_fs.group(5))
-
-            # load PEC (always material 1)
-            mat_pec = self._mat_pec.search(self._geom_info)
-            self._materials.append(XFMaterial())
-            self._materials[1].name = mat_pec.group(1)
-
-            # load normal electric values
-            mat1 = self._mat_norm_electric.findall(self._geom_info)
-
-            for mat_index in range(len(mat1)):
-                self._materials.append(XFMaterial())
-                self._materials[-1].name = mat1[mat_index][self.NAME]
-                self._materials[-1].conductivity = float(mat1[mat_index][self.CONDUCTIVITY])
-                self._materials[-1].density = float(mat1[mat_index][self.DENSITY])
-                self._materials[-1].epsilon_r = float(mat1[mat_index][self.PERMITTIVITY])
-                self._materials[-1].tissue = int(mat1[mat_index][self.TISSUE])
-        else:
+        """
+        Return the list of materials indexed by material number: free
+        space (material 0), PEC (material 1) and the normal electric
+        materials, None for numbers used by no normal electric material.
+        """
+        return list(self._materials)
+
+    @property
+    def material_table(self):
+        """
+        Return the XFMaterialTable of the materials, rows indexed by
+        material number as in load_materials.
+        """
+        return self._material_table
+
+    def _load_geometry(self, cache_dir):
+        """Load grid data and materials, parsing geometry.input on a miss."""
+        if not os.path.exists(self._geometry_input_file_path):
             print("Could not find file: ", self._geometry_input_file_path)
+            return
 
-        return self._materials
-
-    def _load_grid_data(self):
-        """Load grid data from material.input"""
-        if os.path.exists(self._geometry_input_file_path):
-            file_handle = open(self._geometry_input_file_path, 'r')
-            self._geom_info = file_handle.read()
-            file_handle.close()
-            # load grid information
-            grid_def1 = self._grid_definition.search(self._geom_info)
-            self.grid_data.origin = [float(grid_def1.group(1)), \
-                                     float(grid_def1.group(2)), \
-                                     float(grid_def1.group(3))]
-            self.grid_data.num_x_cells = int(grid_def1.group(4))
-            self.grid_data.num_y_cells = int(grid_def1.group(5))
-            self.grid_data.num_z_cells = int(grid_def1.group(6))
-
-            ind_begin_delx = self._begin_delx.search(self._geom_info).span()[1]
-            ind_end_delx = self._end_delx.search(self._geom_info).span()[0]
-            ind_begin_dely = self._begin_dely.search(self._geom_info).span()[1]
-            ind_end_dely = self._end_dely.search(self._geom_info).span()[0]
-            ind_begin_delz = self._begin_delz.search(self._geom_info).span()[1]
-            ind_end_delz = self._end_delz.search(self._geom_info).span()[0]
-            self.grid_data.x_deltas = self._grid_delta.findall( \
-                                  self._geom_info[ind_begin_delx:ind_end_delx])
-            self.grid_data.y_deltas = self._grid_delta.findall( \
-                                  self._geom_info[ind_begin_dely:ind_end_dely])
-            self.grid_data.z_deltas = self._grid_delta.findall( \
-                                  self._geom_info[ind_begin_delz:ind_end_delz])
+        disk_cache = None
+        if cache_dir is not None:
+            disk_cache = XFJsonCache(cache_dir, GEOMETRY_CACHE_KIND)
+            key = disk_cache.source_key(self._geometry_input_file_path)
         else:
-            print("Could not find file: ", self._geometry_input_file_path)
+            key = _file_key(self._geometry_input_file_path)
+
+        geometry = _GEOMETRY_CACHE.get(key)
+        if geometry is None and disk_cache is not None:
+            document = disk_cache.load(key)
+            if document is not None:
+                geometry = _geometry_from_json(document)
+        if geometry is None:
+            geometry = _parse_geometry(self._geometry_input_file_path)
+            if disk_cache is not None:
+                print("Caching parsed geometry in " + disk_cache.cache_dir)
+                disk_cache.save(key, _geometry_to_json(geometry))
+        if 'material_table' not in geometry:
+            # built once per process, the table arrays are read-only
+            geometry['material_table'] = XFMaterialTable(
+                [material.name if material is not None else ''
+                 for material in geometry['materials']], geometry['rows'],
+                [material.tissue if material is not None else 0
+                 for material in geometry['materials']])
+        _GEOMETRY_CACHE.put(key, geometry)
+
+        self.grid_data = copy.deepcopy(geometry['grid_data'])
+        self._materials = [copy.copy(material)
+                           for material in geometry['materials']]
+        self._material_table = geometry['material_table']
+
+def clear_geometry_cache():
+    """Drop the parsed geometry held for the process."""
+    _GEOMETRY_CACHE.clear()
+    _FILE_KEYS.clear()
+
+def _file_key(file_name):
+    """
+    Return the content digest of file_name, hashing it again only if its
+    size or mtime changed.
+    """
+    file_name = os.path.realpath(file_name)
+    file_stat = os.stat(file_name)
+    stat_key = (file_name, file_stat.st_size, file_stat.st_mtime)
+    digest = _FILE_KEYS.get(stat_key)
+    if digest is None:
+        digest = xf_file_digest(file_name)
+        _FILE_KEYS.put(stat_key, digest)
+    return digest
+
+def _parse_geometry(file_name):
+    """
+    Return a dict of the grid_data, materials and material table rows
+    parsed from geometry.input file_name.
+    """
+    grid_data = XFGridData()
+    # materials and material table rows by material number, free space
+    # and PEC are always materials 0 and 1
+    materials = {FREE_SPACE_MATERIAL: None, PEC_MATERIAL: None}
+    rows = dict()
+    with open(file_name, 'r') as file_handle:
+        for block in _read_blocks(file_handle):
+            if block.tag == 'GridDefinition':
+                _set_grid_definition(grid_data, block)
+            elif block.tag in ('DelX', 'DelY', 'DelZ'):
+                deltas = [(row[0], row[1]) for row in block.rows
+                          if len(row) == 2]
+                setattr(grid_data, block.tag[-1].lower() + '_deltas', deltas)
+            elif (block.tag == 'electricfreespace' and
+                  materials[FREE_SPACE_MATERIAL] is None):
+                free_space = XFMaterial()
+                free_space.name = block.name
+                free_space.conductivity = _entry(block, 'conductivity')
+                free_space.epsilon_r = _entry(block, 'permittivity')
+                free_space.density = _entry(block, 'density')
+                materials[FREE_SPACE_MATERIAL] = free_space
+                rows[FREE_SPACE_MATERIAL] = _material_row(block)
+            elif (block.tag == 'electricperfectconductor' and
+                  materials[PEC_MATERIAL] is None):
+                pec = XFMaterial()
+                pec.name = block.name
+                materials[PEC_MATERIAL] = pec
+            elif block.tag == 'normal_electric':
+                number = _material_number(block, materials)
+                if not all(key in block.entries
+                           for key in _NORMAL_ELECTRIC_KEYS):
+                    print("Skipping incomplete material: ", block.name)
+                elif number in materials:
+                    print("Skipping duplicate material number: ", number,
+                          block.name)
+                else:
+                    material = XFMaterial()
+                    material.name = block.name
+                    material.conductivity = _entry(block, 'conductivity')
+                    material.density = _entry(block, 'density')
+                    material.epsilon_r = _entry(block, 'permittivity')
+                    material.tissue = int(block.entries['tissue'][0])
+                    materials[number] = material
+                    rows[number] = _material_row(block)
+
+    # the mesh edge runs refer to materials by number
+    numbers = range(max(materials) + 1)
+    return {'grid_data': grid_data,
+            'materials': [materials.get(number) for number in numbers],
+            'rows': [rows.get(number, dict()) for number in numbers]}
+
+def _geometry_to_json(geometry):
+    """Return parsed geometry as plain values for XFJsonCache."""
+    grid_data = geometry['grid_data']
+    return {'grid_data': dict((field, getattr(grid_data, field))
+                              for field in _GRID_DATA_FIELDS),
+            'materials': [None if material is None else
+                          dict((field, getattr(material, field))
+                               for field in _MATERIAL_FIELDS)
+                          for material in geometry['materials']],
+            'rows': geometry['rows']}
+
+def _geometry_from_json(document):
+    """Return parsed geometry from the plain values of _geometry_to_json."""
+    grid_data = XFGridData()
+    for field in _GRID_DATA_FIELDS:
+        value = document['grid_data'][field]
+        # the delta setters need a non-empty table
+        if value != []:
+            setattr(grid_data, field, value)
+    materials = []
+    for fields in document['materials']:
+        material = None
+        if fields is not None:
+            material = XFMaterial()
+            for field in _MATERIAL_FIELDS:
+                setattr(material, field, fields[field])
+        materials.append(material)
+    return {'grid_data': grid_data,
+            'materials': materials,
+            'rows': document['rows']}
+
+def _set_grid_definition(grid_data, block):
+    """Set the grid origin and number of cells."""
+    grid_data.origin = [float(value) for value in
+                        block.entries['GridOriginInMeters'][:3]]
+    grid_data.num_x_cells = int(block.entries['NumberOfCellsInX'][0])
+    grid_data.num_y_cells = int(block.entries['NumberOfCellsInY'][0])
+    grid_data.num_z_cells = int(block.entries['NumberOfCellsInZ'][0])
+
+def _entry(block, key):
+    """Return the float value of entry key of block."""
+    return float(block.entries[key][0])
+
+def _material_number(block, materials):
+    """
+    Return the material_number of block, the number after the highest one
+    seen if it has none.
+    """
+    if 'material_number' in block.entries:
+        return int(block.entries['material_number'][0])
+    return max(materials) + 1
 
+def _material_row(block):
+    """Return the material table columns given by the entries of block."""
+    return dict((column, _entry(block, key))
+                for (column, key) in _MATERIAL_COLUMN_KEYS.items()
+                if key in block.entries)
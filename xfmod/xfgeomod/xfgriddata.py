@@ -5,6 +5,27 @@ Class to store grid data extracted from XFdtd geometry.input
 from __future__ import (absolute_import, division, generators,
                         print_function, unicode_literals)
 
+import numpy as np
+
+def _cumulative_coods(origin, deltas, num_cells):
+    """
+    Return the read-only float64 coordinates of num_cells cells starting at
+    origin, where deltas is the [start_index, delta] table: each delta
+    applies from its start index to the next start index (the last to
+    num_cells).  The deltas are accumulated in order from origin, so the
+    values match adding them one cell at a time.
+    """
+    starts = np.array([delta[0] for delta in deltas], dtype=np.int64)
+    steps = np.array([delta[1] for delta in deltas], dtype=np.float64)
+    counts = np.maximum(np.diff(np.append(starts, num_cells)), 0)
+    cell_deltas = np.repeat(steps, counts)
+    coods = np.empty(len(cell_deltas), dtype=np.float64)
+    if len(coods) > 0:
+        np.add.accumulate(np.concatenate(([float(origin)],
+                                          cell_deltas[:-1])), out=coods)
+    coods.flags.writeable = False
+    return coods
+
 class XFGridData(object):
     """XFdtd project grid data property class."""
 
@@ -18,6 +39,16 @@ class XFGridData(object):
         self._x_deltas = []
         self._y_deltas = []
         self._z_deltas = []
+        # coordinates are computed on first use and reset by the setters
+        self._x_coods = None
+        self._y_coods = None
+        self._z_coods = None
+
+    def _reset_coods(self):
+        """Drop the cached coordinates."""
+        self._x_coods = None
+        self._y_coods = None
+        self._z_coods = None
 
     @property
     def origin(self):
@@ -28,6 +59,7 @@ class XFGridData(object):
     def origin(self, origin):
         """Set the fdtd origin."""
         if len(origin) == 3:
+            self._reset_coods()
             self._origin_x = float(origin[0])
             self._origin_y = float(origin[1])
             self._origin_z = float(origin[2])
@@ -50,6 +82,7 @@ class XFGridData(object):
     def num_x_cells(self, value):
         """Set number of X cells in fdtd grid."""
         self._num_x_cells = value
+        self._x_coods = None
 
     @num_x_cells.deleter
     def num_x_cells(self):
@@ -65,6 +98,7 @@ class XFGridData(object):
     def num_y_cells(self, value):
         """Set number of Y cells in fdtd grid."""
         self._num_y_cells = value
+        self._y_coods = None
 
     @num_y_cells.deleter
     def num_y_cells(self):
@@ -80,6 +114,7 @@ class XFGridData(object):
     def num_z_cells(self, value):
         """Set number of Z cells in fdtd grid."""
         self._num_z_cells = value
+        self._z_coods = None
 
     @num_z_cells.deleter
     def num_z_cells(self):
@@ -94,6 +129,7 @@ class XFGridData(object):
     @x_deltas.setter
     def x_deltas(self, value):
         """Set the x-direction deltas in fdtd grid."""
+        self._x_coods = None
         self._x_deltas = []
         if len(value[0]) == 2:
             for ind in range(len(value)):
@@ -115,6 +151,7 @@ class XFGridData(object):
     @y_deltas.setter
     def y_deltas(self, value):
         """Set the y-direction deltas in fdtd grid."""
+        self._y_coods = None
         self._y_deltas = []
         if len(value[0]) == 2:
             for ind in range(len(value)):
@@ -136,6 +173,7 @@ class XFGridData(object):
     @z_deltas.setter
     def z_deltas(self, value):
         """Set the z-direction deltas in fdtd grid."""
+        self._z_coods = None
         self._z_deltas = []
         if len(value[0]) == 2:
             for ind in range(len(value)):
@@ -151,51 +189,21 @@ class XFGridData(object):
 
     def x_coods(self):
         """Return the X coordinate values from origin and deltas."""
-        cood_cumulative = self._origin_x  # cumulative x value
-        coods = []                        # x value array
-
-        for i in range(0, len(self._x_deltas)-1):
-            for j in range(int(self._x_deltas[i][0]), \
-                           int(self._x_deltas[i+1][0])):
-                coods.append(cood_cumulative)
-                cood_cumulative += self._x_deltas[i][1]
-
-        for i in range(self._x_deltas[-1][0], self._num_x_cells):
-            coods.append(cood_cumulative)
-            cood_cumulative += self._x_deltas[-1][1]
-
-        return coods
+        if self._x_coods is None:
+            self._x_coods = _cumulative_coods(self._origin_x, self._x_deltas,
+                                              self._num_x_cells)
+        return self._x_coods
 
     def y_coods(self):
         """Return the Y coordinate values from origin and deltas."""
-        cood_cumulative = self._origin_y  # cumulative y value
-        coods = []                        # y value array
-
-        for i in range(0, len(self._y_deltas)-1):
-            for j in range(int(self._y_deltas[i][0]), \
-                           int(self._y_deltas[i+1][0])):
-                coods.append(cood_cumulative)
-                cood_cumulative += self._y_deltas[i][1]
-
-        for i in range(self._y_deltas[-1][0], self._num_y_cells):
-            coods.append(cood_cumulative)
-            cood_cumulative += self._y_deltas[-1][1]
-
-        return coods
+        if self._y_coods is None:
+            self._y_coods = _cumulative_coods(self._origin_y, self._y_deltas,
+                                              self._num_y_cells)
+        return self._y_coods
 
     def z_coods(self):
         """Return the Z coordinate values from origin and deltas."""
-        cood_cumulative = self._origin_z  # cumulative z value
-        coods = []                        # z value array
-
-        for i in range(0, len(self._z_deltas)-1):
-            for j in range(int(self._z_deltas[i][0]), \
-                           int(self._z_deltas[i+1][0])):
-                coods.append(cood_cumulative)
-                cood_cumulative += self._z_deltas[i][1]
-
-        for i in range(self._z_deltas[-1][0], self._num_z_cells):
-            coods.append(cood_cumulative)
-            cood_cumulative += self._z_deltas[-1][1]
-
-        return coods
+        if self._z_coods is None:
+            self._z_coods = _cumulative_coods(self._origin_z, self._z_deltas,
+                                              self._num_z_cells)
+        return self._z_coods
@@ -9,10 +9,62 @@ from __future__ import (absolute_import, division, generators,
 
 from scipy.io import savemat
 import numpy as np
+from xfmod.xfutils import XFLRUCache, xf_is_string
+from xfmod.xfgeomod.xfmesh import EDGE_RUN_BATCH_RUNS, EDGE_RUN_DIRECTIONS
+from xfmod.xfgeomod.xfmaterialtable import FREE_SPACE_MATERIAL
+
+# mesh properties derived from the material IDs and their mat file names
+MESH_PROPERTIES = ('density', 'sigma', 'epsilon_r', 'tissue')
+# properties written by export_mesh_data unless others are requested
+EXPORT_MESH_PROPERTIES = ('density', 'sigma', 'epsilon_r')
+# properties of magnetic (H) edges; sigma and epsilon_r are electric
+H_MESH_PROPERTIES = ('density', 'tissue')
+# directions used unless others are requested
+DEFAULT_MESH_DIRECTIONS = ('ex', 'ey', 'ez')
+MESH_PROPERTY_KEYS = {'density': 'Density', 'sigma': 'Sigma',
+                      'epsilon_r': 'Epsilon_r', 'tissue': 'Tissue'}
+# Default byte budget of the property volumes kept by each XFGridExporter
+MESH_PROPERTY_CACHE_BYTES = 512 * 1024 * 1024
+
+def _check_directions(directions):
+    """Return directions as a list of edge directions, Ex..Ez if None."""
+    if directions is None:
+        return list(DEFAULT_MESH_DIRECTIONS)
+    if xf_is_string(directions):
+        directions = [directions]
+    directions = [direction.lower() for direction in directions]
+    for direction in directions:
+        if direction not in EDGE_RUN_DIRECTIONS:
+            raise ValueError("Invalid edge direction: " + direction)
+    return directions
+
+def _mat_id_dtype(num_ids):
+    """Return the smallest unsigned integer dtype holding num_ids IDs."""
+    for dtype in (np.uint8, np.uint16):
+        if num_ids <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint32)
 
 class XFGridExporter(object):
-    """Export grid and mesh info."""
-    def __init__(self, grid, mesh):
+    """
+    Export grid and mesh info.
+
+    The mesh is held as one material ID volume per edge direction, built
+    from the edge runs the first time the direction is used.  directions
+    limits the directions ('ex' ... 'hz', default 'ex', 'ey', 'ez') that
+    can be used, so the edge runs of the others are never decoded.  H
+    directions only give the properties in H_MESH_PROPERTIES, since
+    conductivity and permittivity are electric.
+
+    Edges not covered by an edge run have their own ID: free space
+    conductivity and permittivity with NaN density, as opposed to the
+    density 0 of free space edge runs.  PEC edges have NaN density too.
+
+    Property volumes are kept read-only in a least recently used cache of
+    at most cache_bytes (None for unbounded, 0 to disable).
+    """
+    def __init__(self, grid, mesh, directions=None,
+                 cache_bytes=MESH_PROPERTY_CACHE_BYTES):
         self._mesh = mesh
         self._grid = grid
         self._grid_x = self._grid.grid_data.x_coods()
@@ -24,34 +76,16 @@ class XFGridExporter(object):
         self._export_units = 'm'          # grid/mesh units (default = meters)
         self._export_units_scale = 1.0    # scale factor (meters = 1.0)
         self._materials_list = grid.load_materials()
-        self._ex_edge_runs = self._mesh.ex_edge_runs
-        self._ey_edge_runs = self._mesh.ey_edge_runs
-        self._ez_edge_runs = self._mesh.ez_edge_runs
-        self._hx_edge_runs = self._mesh.hx_edge_runs
-        self._hy_edge_runs = self._mesh.hy_edge_runs
-        self._hz_edge_runs = self._mesh.hz_edge_runs
-        self._mesh_ex_density = None
-        self._mesh_ey_density = None
-        self._mesh_ez_density = None
-        self._mesh_ex_sigma = None
-        self._mesh_ey_sigma = None
-        self._mesh_ez_sigma = None
-        self._mesh_ex_epsilon_r = None
-        self._mesh_ey_epsilon_r = None
-        self._mesh_ez_epsilon_r = None
-        self._mesh_ex_tissue = None
-        self._mesh_ey_tissue = None
-        self._mesh_ez_tissue = None
-        self._mesh_hx_density = None
-        self._mesh_hy_density = None
-        self._mesh_hz_density = None
-        self._mesh_hx_sigma = None
-        self._mesh_hy_sigma = None
-        self._mesh_hz_sigma = None
-        self._mesh_hx_epsilon_r = None
-        self._mesh_hy_epsilon_r = None
-        self._mesh_hz_epsilon_r = None
-        self._set_mesh_data()
+        self._material_table = grid.material_table
+        self._directions = _check_directions(directions)
+        # material ID volume of each edge direction ('ex' ... 'hz')
+        self._mat_ids = dict()
+        # ID of the edges not covered by an edge run
+        self._unmeshed_id = len(self._materials_list)
+        # property lookup tables, indexed by material ID
+        self._luts = None
+        # property volumes by (direction, property)
+        self._property_cache = XFLRUCache(max_bytes=cache_bytes)
 
     @property
     def grid_x(self):
@@ -76,62 +110,97 @@ class XFGridExporter(object):
     @property
     def ex_sigma(self):
         """Return conductivity on Ex grid locations."""
-        return self._mesh_ex_sigma
+        return self.mesh_property('ex', 'sigma')
 
     @property
     def ey_sigma(self):
         """Return conductivity on Ey grid locations."""
-        return self._mesh_ey_sigma
+        return self.mesh_property('ey', 'sigma')
 
     @property
     def ez_sigma(self):
         """Return conductivity on Ez grid locations."""
-        return self._mesh_ez_sigma
+        return self.mesh_property('ez', 'sigma')
 
     @property
     def ex_epsilon_r(self):
         """Return relative permittivity on Ex grid locations."""
-        return self._mesh_ex_epsilon_r
+        return self.mesh_property('ex', 'epsilon_r')
 
     @property
     def ey_epsilon_r(self):
         """Return relative permittivity on Ey grid locations."""
-        return self._mesh_ey_epsilon_r
+        return self.mesh_property('ey', 'epsilon_r')
 
     @property
     def ez_epsilon_r(self):
         """Return relative permittivity on Ez grid locations."""
-        return self._mesh_ez_epsilon_r
+        return self.mesh_property('ez', 'epsilon_r')
 
     @property
     def ex_density(self):
         """Return density on Ex grid locations."""
-        return self._mesh_ex_density
+        return self.mesh_property('ex', 'density')
 
     @property
     def ey_density(self):
         """Return density on Ey grid locations."""
-        return self._mesh_ey_density
+        return self.mesh_property('ey', 'density')
 
     @property
     def ez_density(self):
         """Return density on Ez grid locaitons."""
-        return self._mesh_ez_density
+        return self.mesh_property('ez', 'density')
 
     @property
     def ex_tissue(self):
         """Return tissue mask on Ex grid locations."""
-        return self._mesh_ex_tissue
+        return self.mesh_property('ex', 'tissue')
 
     @property
     def ey_tissue(self):
         """Return tissue mask on Ey grid locations."""
-        return self._mesh_ey_tissue
+        return self.mesh_property('ey', 'tissue')
 
     @property
     def ez_tissue(self):
         """Return tissue mask on Ez grid locations."""
-        return self._mesh_ez_tissue
+        return self.mesh_property('ez', 'tissue')
+
+    @property
+    def hx_density(self):
+        """Return density on Hx grid locations."""
+        return self.mesh_property('hx', 'density')
+
+    @property
+    def hy_density(self):
+        """Return density on Hy grid locations."""
+        return self.mesh_property('hy', 'density')
+
+    @property
+    def hz_density(self):
+        """Return density on Hz grid locations."""
+        return self.mesh_property('hz', 'density')
+
+    @property
+    def hx_tissue(self):
+        """Return tissue mask on Hx grid locations."""
+        return self.mesh_property('hx', 'tissue')
+
+    @property
+    def hy_tissue(self):
+        """Return tissue mask on Hy grid locations."""
+        return self.mesh_property('hy', 'tissue')
+
+    @property
+    def hz_tissue(self):
+        """Return tissue mask on Hz grid locations."""
+        return self.mesh_property('hz', 'tissue')
+
+    @property
+    def directions(self):
+        """Return the edge directions available from this exporter."""
+        return list(self._directions)
 
     @units.setter
     def units(self, value):
@@ -162,229 +231,146 @@ class XFGridExporter(object):
         """Return the grid and meshing scale factor."""
         return self._export_units_scale
 
-    def _set_mesh_data(self):
-        """Set mesh data from edge run data."""
-        print('Setting mesh/grid data.')
+    def _set_mesh_data(self, direction):
+        """Set the material ID volume of direction from edge run data."""
+        print('Calculating ' + direction.capitalize() + ' mesh values.')
+        shape = (self._x_dim, self._y_dim, self._z_dim)
+        # initialize to unmeshed free space
+        mat_ids = np.full(shape, self._unmeshed_id,
+                          dtype=_mat_id_dtype(self._unmeshed_id + 1))
+        if getattr(self._mesh, 'num_' + direction + '_edge_runs') > 0:
+            edge_runs = getattr(self._mesh, direction + '_edge_runs')
+            for start in range(0, len(edge_runs), EDGE_RUN_BATCH_RUNS):
+                (indices, mats) = edge_runs[start:start + EDGE_RUN_BATCH_RUNS]\
+                                  .linear_indices(shape)
+                mat_ids.reshape(-1)[indices] = mats
+        self._mat_ids[direction] = mat_ids
+
+    def _material_luts(self):
+        """
+        Return the (density, sigma, epsilon_r, tissue) lookup arrays indexed
+        by material ID: the columns of the geometry material table, then the
+        unmeshed free space edges.
+        """
+        table = self._material_table
+        luts = []
+        for (values, unmeshed) in (
+                (table.density, np.nan),
+                (table.conductivity, table.conductivity[FREE_SPACE_MATERIAL]),
+                (table.epsilon_r, table.epsilon_r[FREE_SPACE_MATERIAL]),
+                (table.tissue, 0)):
+            lut = np.append(values, np.array([unmeshed], dtype=values.dtype))
+            lut.flags.writeable = False
+            luts.append(lut)
+        return luts
+
+    def property_lut(self, direction, property_name):
+        """
+        Return the lookup table of property_name ('density', 'sigma',
+        'epsilon_r' or 'tissue') for the material IDs of direction ('ex'
+        ... 'hz').  E and H edges use the same material table; H edges only
+        have the properties in H_MESH_PROPERTIES.
+        """
+        if property_name not in MESH_PROPERTIES:
+            raise ValueError("Invalid mesh property: " + property_name)
+        field_type = direction.lower()[0]
+        if field_type == 'h' and property_name not in H_MESH_PROPERTIES:
+            raise ValueError("Mesh property " + property_name +
+                             " is not defined on H edges.")
+        if self._luts is None:
+            self._luts = dict(zip(MESH_PROPERTIES, self._material_luts()))
+        return self._luts[property_name]
+
+    def direction_properties(self, direction, properties=None):
+        """
+        Return the properties (default EXPORT_MESH_PROPERTIES) exported for
+        direction, leaving out those not defined on H edges.
+        """
+        if properties is None:
+            properties = EXPORT_MESH_PROPERTIES
+        if direction.lower()[0] == 'h':
+            return [property_name for property_name in properties
+                    if property_name in H_MESH_PROPERTIES]
+        return list(properties)
+
+    def mat_ids(self, direction):
+        """
+        Return the material ID volume of direction ('ex' ... 'hz'), None if
+        the direction was not requested.  IDs below the number of materials
+        are material numbers, the next ID marks edges with no edge run.
+        """
+        direction = direction.lower()
+        if direction not in self._directions:
+            return None
+        if direction not in self._mat_ids:
+            self._set_mesh_data(direction)
+        return self._mat_ids[direction]
+
+    def mesh_property(self, direction, property_name, mat_ids=None):
+        """
+        Return property_name on the direction grid locations, looked up
+        from the material ID volume (or from mat_ids, for instance a
+        regridded ID volume).  Volumes of the exporter's own IDs are cached
+        and read-only; those of mat_ids are new arrays.
+        """
+        if mat_ids is not None:
+            return self.property_lut(direction, property_name)[mat_ids]
+
+        direction = direction.lower()
+        cache_key = (direction, property_name)
+        values = self._property_cache.get(cache_key)
+        if values is None:
+            mat_ids = self.mat_ids(direction)
+            if mat_ids is None:
+                return None
+            values = self.property_lut(direction, property_name)[mat_ids]
+            values.flags.writeable = False
+            self._property_cache.put(cache_key, values)
+        return values
+
+    def clear_cache(self):
+        """Release all cached property volumes."""
+        self._property_cache.clear()
+
+    def mesh_data(self, directions=None, properties=None):
+        """
+        Return a dict of mat file name ('MeshExDensity' ...) to property
+        volume for the requested directions (default all available) and
+        properties (default density, sigma and epsilon_r, of which H
+        directions only get density).
+        """
+        if directions is None:
+            directions = self._directions
+        mesh_dict = dict()
+        for direction in _check_directions(directions):
+            if direction not in self._directions:
+                raise ValueError("Direction " + direction +
+                                 " was not requested from the exporter.")
+            for property_name in self.direction_properties(direction,
+                                                           properties):
+                values = self.mesh_property(direction, property_name)
+                key = 'Mesh' + direction.capitalize() + \
+                      MESH_PROPERTY_KEYS[property_name]
+                print('Adding ' + key + ' to export mat file.')
+                mesh_dict[key] = values
+        return mesh_dict
+
+    def export_mesh_data(self, file_name, directions=None, properties=None):
+        """
+        Export mesh data to matlab file, for the directions and properties
+        as in mesh_data.
+        """
         print('Mesh Units: ', self._export_units)
-
-        # set Ex material properties
-        if self._ex_edge_runs is not None:
-            print('Calculating Ex mesh values.')
-            self._mesh_ex_density = np.empty((self._x_dim,
-                                              self._y_dim,
-                                              self._z_dim),
-                                             dtype=np.dtype(np.float64))
-
-            self._mesh_ex_sigma = np.empty((self._x_dim,
-                                            self._y_dim,
-                                            self._z_dim),
-                                           dtype=np.dtype(np.float64))
-            self._mesh_ex_epsilon_r = np.empty((self._x_dim,
-                                                self._y_dim,
-                                                self._z_dim),
-                                               dtype=np.dtype(np.float64))
-            self._mesh_ex_tissue = np.empty((self._x_dim,
-                                             self._y_dim,
-                                             self._z_dim),
-                                            dtype=np.dtype(np.int))
-            # initialize to freespace
-            self._mesh_ex_density[:] = np.NAN
-            self._mesh_ex_sigma[:] = self._materials_list[0].conductivity
-            # relative permittivity is set to zero for PEC values (mat type 1)
-            # free space (mat type 0) or material permittivity for all others.
-            self._mesh_ex_epsilon_r[:] = self._materials_list[0].epsilon_r
-            for edge_run in self._ex_edge_runs:
-                for index in range(edge_run.x_ind, edge_run.stop_ind):
-                    if edge_run.mat == 1:
-                        self._mesh_ex_epsilon_r[index,
-                                                edge_run.y_ind,
-                                                edge_run.z_ind] = 0.0
-                    else:
-                        self._mesh_ex_density[index, edge_run.y_ind, edge_run.z_ind] = self._materials_list[edge_run.mat].density
-                        self._mesh_ex_sigma[index, edge_run.y_ind, edge_run.z_ind] = self._materials_list[edge_run.mat].conductivity
-                        self._mesh_ex_epsilon_r[index, edge_run.y_ind, edge_run.z_ind] = self._materials_list[edge_run.mat].epsilon_r
-                        self._mesh_ex_tissue[index, edge_run.y_ind, edge_run.z_ind] = self._materials_list[edge_run.mat].tissue
-
-        # set Ey material properties
-        if self._ey_edge_runs is not None:
-            print('Calculating Ey mesh values.')
-            self._mesh_ey_density = np.empty((self._x_dim,
-                                              self._y_dim,
-                                              self._z_dim),
-                                             dtype=np.dtype(np.float64))
-            self._mesh_ey_sigma = np.empty((self._x_dim,
-                                            self._y_dim,
-                                            self._z_dim),
-                                           dtype=np.dtype(np.float64))
-            self._mesh_ey_epsilon_r = np.empty((self._x_dim,
-                                                self._y_dim,
-                                                self._z_dim),
-                                               dtype=np.dtype(np.float64))
-            self._mesh_ey_tissue = np.empty((self._x_dim,
-                                             self._y_dim,
-                                             self._z_dim),
-                                            dtype=np.dtype(np.int))
-            # initialize to freespace
-            self._mesh_ey_density[:] = np.NAN
-            self._mesh_ey_sigma[:] = self._materials_list[0].conductivity
-            # relative permittivity is set to zero for PEC values (mat type 1)
-            # free space (mat type 0) or material permittivity for all others.
-            self._mesh_ey_epsilon_r[:] = self._materials_list[0].epsilon_r
-            for edge_run in self._ey_edge_runs:
-                for index in range(edge_run.y_ind, edge_run.stop_ind):
-                    if edge_run.mat == 1:
-                        self._mesh_ey_epsilon_r[edge_run.x_ind, index, edge_run.z_ind] = 0.0
-                    else:
-                        self._mesh_ey_density[edge_run.x_ind, index, edge_run.z_ind] = self._materials_list[edge_run.mat].density
-                        self._mesh_ey_sigma[edge_run.x_ind, index, edge_run.z_ind] = self._materials_list[edge_run.mat].conductivity
-                        self._mesh_ey_epsilon_r[edge_run.x_ind, index, edge_run.z_ind] = self._materials_list[edge_run.mat].epsilon_r
-                        self._mesh_ey_tissue[edge_run.x_ind, index, edge_run.z_ind] = self._materials_list[edge_run.mat].tissue
-
-        # set Ez material properties
-        if self._ez_edge_runs is not None:
-            print('Calculating Ez mesh values.')
-            self._mesh_ez_density = np.empty((self._x_dim,
-                                              self._y_dim,
-                                              self._z_dim),
-                                             dtype=np.dtype(np.float64))
-            self._mesh_ez_sigma = np.empty((self._x_dim,
-                                            self._y_dim,
-                                            self._z_dim),
-                                           dtype=np.dtype(np.float64))
-            self._mesh_ez_epsilon_r = np.empty((self._x_dim,
-                                                self._y_dim,
-                                                self._z_dim),
-                                               dtype=np.dtype(np.float64))
-            self._mesh_ez_tissue = np.empty((self._x_dim,
-                                             self._y_dim,
-                                             self._z_dim),
-                                            dtype=np.dtype(np.float64))
-
-            # initialize to freespace
-            self._mesh_ez_density[:] = np.NAN
-            self._mesh_ez_sigma[:] = self._materials_list[0].conductivity
-            # relative permittivity is set to zero for PEC values (mat type 1)
-            # free space (mat type 0) or material permittivity for all others.
-            self._mesh_ez_epsilon_r[:] = self._materials_list[0].epsilon_r
-            for edge_run in self._ez_edge_runs:
-                for index in range(edge_run.z_ind, edge_run.stop_ind):
-                    if edge_run.mat == 1:
-                        self._mesh_ez_epsilon_r[edge_run.x_ind, edge_run.y_ind, index] = 0.0
-                    else:
-                        self._mesh_ez_density[edge_run.x_ind, edge_run.y_ind, index] = self._materials_list[edge_run.mat].density
-                        self._mesh_ez_sigma[edge_run.x_ind, edge_run.y_ind, index] = self._materials_list[edge_run.mat].conductivity
-                        self._mesh_ez_epsilon_r[edge_run.x_ind, edge_run.y_ind, index] = self._materials_list[edge_run.mat].epsilon_r
-                        self._mesh_ez_tissue[edge_run.x_ind, edge_run.y_ind, index] = self._materials_list[edge_run.mat].tissue
-
-        # set Hx material properties
-        if self._hx_edge_runs is not None:
-            print('Calculating Hx mesh values.')
-            self._mesh_hx_density = np.empty((self._x_dim,
-                                              self._y_dim,
-                                              self._z_dim))
-            self._mesh_hx_sigma = np.empty((self._x_dim,
-                                            self._y_dim,
-                                            self._z_dim))
-            self._mesh_hx_density[:] = np.NAN
-            self._mesh_hx_sigma[:] = np.NAN
-            for edge_run in self._hx_edge_runs:
-                for index in range(edge_run.x_ind, edge_run.stop_ind):
-                    if edge_run.mat > 1:
-                        self._mesh_hx_density[index, edge_run.y_ind, edge_run.z_ind] = self._materials_list[edge_run.mat].density
-                        self._mesh_hx_sigma[index, edge_run.y_ind, edge_run.z_ind] = self._materials_list[edge_run.mat].conductivity
-
-        # set Hy material properties
-        if self._hy_edge_runs is not None:
-            print('Calculating Hy mesh values.')
-            self._mesh_hy_density = np.empty((self._x_dim,
-                                              self._y_dim,
-                                              self._z_dim))
-            self._mesh_hy_sigma = np.empty((self._x_dim,
-                                            self._y_dim,
-                                            self._z_dim))
-            self._mesh_hy_density[:] = np.NAN
-            self._mesh_hy_sigma[:] = np.NAN
-
-            for edge_run in self._hy_edge_runs:
-                for index in range(edge_run.y_ind, edge_run.stop_ind):
-                    if edge_run.mat > 1:
-                        self._mesh_hy_density[edge_run.x_ind, index, edge_run.z_ind] = self._materials_list[edge_run.mat].density
-                        self._mesh_hy_sigma[edge_run.x_ind, index, edge_run.z_ind] = self._materials_list[edge_run.mat].conducivity
-
-        # set Hz material properties
-        if self._hz_edge_runs is not None:
-            print('Calculating Hz mesh values.')
-            self._mesh_hz_density = np.empty((self._x_dim,
-                                              self._y_dim,
-                                              self._z_dim))
-            self._mesh_hz_sigma = np.empty((self._x_dim,
-                                            self._y_dim,
-                                            self._z_dim))
-            self._mesh_hz_density[:] = np.NAN
-            self._mesh_hz_sigma[:] = np.NAN
-            for edge_run in self._hz_edge_runs:
-                for index in range(edge_run.z_ind, edge_run.stop_ind):
-                    if edge_run.mat > 1:
-                        self._mesh_hz_density[edge_run.x_ind, edge_run.y_ind, index] = self._materials_list[edge_run.mat].density
-                        self._mesh_hz_sigma[edge_run.x_ind, edge_run.y_ind, index] = self._materials_list[edge_run.mat].conducivity
-
-    def export_mesh_data(self, file_name):
-        """Export mesh data to matlab file."""
-        export_dict = dict()
-        if self._mesh_ex_density is not None:
-            print('Adding MeshExDensity to export mat file.')
-            export_dict['MeshExDensity'] = self._mesh_ex_density
-        if self._mesh_ex_sigma is not None:
-            print('Adding MeshExSigma to export mat file.')
-            export_dict['MeshExSigma'] = self._mesh_ex_sigma
-        if self._mesh_ex_epsilon_r is not None:
-            print('Adding MeshExEpsilon_r to export mat file.')
-            export_dict['MeshExEpsilon_r'] = self._mesh_ex_epsilon_r
-        if self._mesh_ey_density is not None:
-            print('Adding MeshEyDensity to export mat file.')
-            export_dict['MeshEyDensity'] = self._mesh_ey_density
-        if self._mesh_ey_sigma is not None:
-            print('Adding MeshEySigma to export mat file.')
-            export_dict['MeshEySigma'] = self._mesh_ey_sigma
-        if self._mesh_ey_epsilon_r is not None:
-            print('Adding MeshEyEpsilon_r to export mat file.')
-            export_dict['MeshEyEpsilon_r'] = self._mesh_ey_epsilon_r
-        if self._mesh_ez_density is not None:
-            print('Adding MeshEzDensity to export mat file.')
-            export_dict['MeshEzDensity'] = self._mesh_ez_density
-        if self._mesh_ez_sigma is not None:
-            print('Adding MeshEzSigma to export mat file.')
-            export_dict['MeshEzSigma'] = self._mesh_ez_sigma
-        if self._mesh_ez_epsilon_r is not None:
-            print('Adding MeshEzEpsilon_r to export mat file.')
-            export_dict['MeshEzEpsilon_r'] = self._mesh_ez_epsilon_r
-        if self._mesh_hx_density is not None:
-            print('Adding MeshHxDensity to export mat file.')
-            export_dict['MeshHxDensity'] = self._mesh_hx_density
-        if self._mesh_hx_sigma is not None:
-            print('Adding MeshHxSigma to export mat file.')
-            export_dict['MeshHxSigma'] = self._mesh_hx_sigma
-        if self._mesh_hy_density is not None:
-            print('Adding MeshHyDensity to export mat file.')
-            export_dict['MeshHyDensity'] = self._mesh_hy_density
-        if self._mesh_hy_sigma is not None:
-            print('Adding MeshHySigma to export mat file.')
-            export_dict['MeshHySigma'] = self._mesh_hy_sigma
-        if self._mesh_hz_density is not None:
-            print('Adding MeshHzDensity to export mat file.')
-            export_dict['MeshHzDensity'] = self._mesh_hz_density
-        if self._mesh_hz_sigma is not None:
-            print('Adding MeshHzSigma to export mat file.')
-            export_dict['MeshHzSigma'] = self._mesh_hz_sigma
+        export_dict = self.mesh_data(directions, properties)
         if self._grid_x is not None:
             print('Adding grid_X to export mat file.')
-            export_dict['grid_X'] = [x*self._export_units_scale for x in self._grid_x]
+            export_dict['grid_X'] = self._grid_x * self._export_units_scale
         if self._grid_y is not None:
             print('Adding grid_Y to export mat file.')
-            export_dict['grid_Y'] = [x*self._export_units_scale for x in self._grid_y]
+            export_dict['grid_Y'] = self._grid_y * self._export_units_scale
         if self._grid_z is not None:
             print('Adding grid_Z to export mat file.')
-            export_dict['grid_Z'] = [x*self._export_units_scale for x in self._grid_z]
+            export_dict['grid_Z'] = self._grid_z * self._export_units_scale
             export_dict['units'] = self._export_units
 
         # writing data to mat file (file_name)
@@ -0,0 +1,135 @@
+"""
+Columnar table of the materials extracted from XFdtd geometry.input
+"""
+
+# Ensure python 2 and 3 compatibility
+from __future__ import (absolute_import, division, generators,
+                        print_function, unicode_literals)
+
+import numpy as np
+
+# material numbers of the materials every geometry.input defines
+FREE_SPACE_MATERIAL = 0
+PEC_MATERIAL = 1
+
+# float columns of the table, NaN where a material does not define them
+MATERIAL_COLUMNS = ('conductivity', 'epsilon_r', 'density', 'water_ratio',
+                    'heat_capacity', 'thermal_conductivity', 'perfusion_rate',
+                    'metabolic_heat')
+
+class XFMaterialTable(object):
+    """
+    Material properties as NumPy arrays indexed by material number, so
+    properties of many mesh edges are gathered with one fancy index
+    (table.density[mats]).
+
+    Free space and PEC are rows 0 and 1, set up so they need no special
+    casing: free space keeps its geometry.input density (0), PEC has NaN
+    density, free space conductivity and relative permittivity zero, and
+    both have tissue 0.
+    """
+    def __init__(self, names, rows, tissue):
+        """
+        names, rows and tissue give each material in material number order:
+        its name, a dict of MATERIAL_COLUMNS values (missing ones are NaN)
+        and its tissue flag.
+        """
+        if not len(names) == len(rows) == len(tissue):
+            raise ValueError("Material names, rows and tissue differ "
+                             "in length.")
+        self._names = list(names)
+        self._columns = dict()
+        for column in MATERIAL_COLUMNS:
+            values = np.array([row.get(column, np.nan) for row in rows],
+                              dtype=np.float64)
+            self._columns[column] = values
+        self._tissue = np.array(tissue, dtype=np.int64)
+        self._pec = np.zeros(len(self._names), dtype=bool)
+
+        num_mats = len(self._names)
+        if num_mats > FREE_SPACE_MATERIAL:
+            if np.isnan(self._columns['density'][FREE_SPACE_MATERIAL]):
+                self._columns['density'][FREE_SPACE_MATERIAL] = 0.0
+            self._tissue[FREE_SPACE_MATERIAL] = 0
+        if num_mats > PEC_MATERIAL:
+            self._pec[PEC_MATERIAL] = True
+            self._columns['density'][PEC_MATERIAL] = np.nan
+            self._columns['conductivity'][PEC_MATERIAL] = \
+                self._columns['conductivity'][FREE_SPACE_MATERIAL]
+            self._columns['epsilon_r'][PEC_MATERIAL] = 0.0
+            self._tissue[PEC_MATERIAL] = 0
+
+        for values in list(self._columns.values()) + [self._tissue,
+                                                      self._pec]:
+            values.flags.writeable = False
+
+    def __len__(self):
+        return len(self._names)
+
+    def column(self, name):
+        """
+        Return the array of column name: 'tissue', 'pec' or one of
+        MATERIAL_COLUMNS.
+        """
+        if name == 'tissue':
+            return self._tissue
+        if name == 'pec':
+            return self._pec
+        if name not in self._columns:
+            raise ValueError("Invalid material column: " + name)
+        return self._columns[name]
+
+    @property
+    def names(self):
+        """Return the material names."""
+        return list(self._names)
+
+    @property
+    def conductivity(self):
+        """Return the conductivity (S/m) of each material."""
+        return self._columns['conductivity']
+
+    @property
+    def epsilon_r(self):
+        """Return the relative permittivity of each material."""
+        return self._columns['epsilon_r']
+
+    @property
+    def density(self):
+        """Return the density (kg/m^3) of each material."""
+        return self._columns['density']
+
+    @property
+    def tissue(self):
+        """Return the tissue flag of each material.  0 = not tissue"""
+        return self._tissue
+
+    @property
+    def pec(self):
+        """Return True for the perfect electric conductor."""
+        return self._pec
+
+    @property
+    def water_ratio(self):
+        """Return the water ratio of each material."""
+        return self._columns['water_ratio']
+
+    @property
+    def heat_capacity(self):
+        """Return the heat capacity of each material."""
+        return self._columns['heat_capacity']
+
+    @property
+    def thermal_conductivity(self):
+        """Return the thermal conductivity of each material."""
+        return self._columns['thermal_conductivity']
+
+    @property
+    def perfusion_rate(self):
+        """Return the perfusion rate of each material."""
+        return self._columns['perfusion_rate']
+
+    @property
+    def metabolic_heat(self):
+        """Return the metabolic heat of each material."""
+        return self._columns['metabolic_heat']
@@ -7,8 +7,28 @@ from __future__ import absolute_import, division, generators, print_function
 
 import os
 import struct
-from xfmod.xfutils import xf_run_id_to_str, xf_sim_id_to_str
 from math import floor
+import numpy as np
+from xfmod.xfutils import (xf_run_id_to_str, xf_sim_id_to_str,
+                           XFArrayCache, xf_cache_dir)
+
+# Packed edge run records: mesh.input version 0,1 (17 bytes) and version 2
+# flat index format (13 bytes)
+EDGE_RUN_DTYPE = np.dtype([('x_ind', '<u4'), ('y_ind', '<u4'),
+                           ('z_ind', '<u4'), ('stop_ind', '<u4'),
+                           ('mat', 'u1')])
+EDGE_RUN_FLAT_DTYPE = np.dtype([('flat_index', '<u8'), ('stop_ind', '<u4'),
+                                ('mat', 'u1')])
+
+# Edge run directions, E then H
+EDGE_RUN_DIRECTIONS = ('ex', 'ey', 'ez', 'hx', 'hy', 'hz')
+
+# Default number of edge runs per batch yielded by XFMesh.iter_edge_runs
+EDGE_RUN_BATCH_RUNS = 1 << 20
+
+# On-disk cache entry kind for decoded meshes; bump if the layout changes
+MESH_CACHE_KIND = 'xfmesh-2'
+_EDGE_RUN_COLUMNS = ('x_ind', 'y_ind', 'z_ind', 'stop_ind', 'mat')
 
 class XFMeshEdgeRun(object):
     """
@@ -139,22 +159,191 @@ class XFMeshEdgeRun(object):
         """Delete the edge run material."""
         self._mat = None
 
+def _column(values, dtype):
+    """Return values as a contiguous one dimensional array of dtype."""
+    if values is None:
+        return np.zeros(0, dtype=dtype)
+    return np.ascontiguousarray(values, dtype=dtype).reshape(-1)
+
+class XFMeshEdgeRunTable(object):
+    """
+    XFMeshEdgeRunTable: columnar table of the edge runs of one direction.
+
+    x_ind, y_ind, z_ind and stop_ind are held as uint32 arrays and mat as a
+    uint8 array (17 bytes per run).  Indexing with an integer returns an
+    XFMeshEdgeRun; indexing with a slice, index array or boolean mask
+    returns a new table.  Iteration yields XFMeshEdgeRun instances.
+    """
+    def __init__(self, run_type='', x_ind=None, y_ind=None, z_ind=None,
+                 stop_ind=None, mat=None):
+        if run_type.upper() in ('X', 'Y', 'Z'):
+            self._run_type = run_type.upper()
+        else:
+            self._run_type = ''
+        self._x_ind = _column(x_ind, np.uint32)
+        self._y_ind = _column(y_ind, np.uint32)
+        self._z_ind = _column(z_ind, np.uint32)
+        self._stop_ind = _column(stop_ind, np.uint32)
+        self._mat = _column(mat, np.uint8)
+        if not (len(self._x_ind) == len(self._y_ind) == len(self._z_ind) ==
+                len(self._stop_ind) == len(self._mat)):
+            raise ValueError("Edge run columns must have equal lengths.")
+
+    @classmethod
+    def from_edge_runs(cls, run_type, edge_runs):
+        """Build a table from a sequence of XFMeshEdgeRun."""
+        return cls(run_type,
+                   [edge_run.x_ind for edge_run in edge_runs],
+                   [edge_run.y_ind for edge_run in edge_runs],
+                   [edge_run.z_ind for edge_run in edge_runs],
+                   [edge_run.stop_ind for edge_run in edge_runs],
+                   [edge_run.mat for edge_run in edge_runs])
+
+    @property
+    def run_type(self):
+        """Returns run type: 'X', 'Y', 'Z' or '' if not known."""
+        return self._run_type
+
+    @property
+    def x_ind(self):
+        """Returns X indices (run start indices if run_type is 'X')."""
+        return self._x_ind
+
+    @property
+    def y_ind(self):
+        """Returns Y indices (run start indices if run_type is 'Y')."""
+        return self._y_ind
+
+    @property
+    def z_ind(self):
+        """Returns Z indices (run start indices if run_type is 'Z')."""
+        return self._z_ind
+
+    @property
+    def start_ind(self):
+        """Returns run start indices along run_type."""
+        if self._run_type == 'Y':
+            return self._y_ind
+        elif self._run_type == 'Z':
+            return self._z_ind
+        return self._x_ind
+
+    @property
+    def stop_ind(self):
+        """Returns run stop indices along run_type."""
+        return self._stop_ind
+
+    @property
+    def mat(self):
+        """Returns run materials."""
+        return self._mat
+
+    @property
+    def nbytes(self):
+        """Returns the memory held by the table columns."""
+        return self._x_ind.nbytes + self._y_ind.nbytes + \
+               self._z_ind.nbytes + self._stop_ind.nbytes + self._mat.nbytes
+
+    def __len__(self):
+        return len(self._mat)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return XFMeshEdgeRun(self._run_type, int(self._x_ind[key]),
+                                 int(self._y_ind[key]), int(self._z_ind[key]),
+                                 int(self._stop_ind[key]), int(self._mat[key]))
+        return XFMeshEdgeRunTable(self._run_type, self._x_ind[key],
+                                  self._y_ind[key], self._z_ind[key],
+                                  self._stop_ind[key], self._mat[key])
+
+    def __iter__(self):
+        for (x_ind, y_ind, z_ind, stop_ind, mat) in \
+                zip(self._x_ind.tolist(), self._y_ind.tolist(),
+                    self._z_ind.tolist(), self._stop_ind.tolist(),
+                    self._mat.tolist()):
+            yield XFMeshEdgeRun(self._run_type, x_ind, y_ind, z_ind,
+                                stop_ind, mat)
+
+    def with_material(self, mat):
+        """Return the runs of material mat (a number or list of numbers)."""
+        return self[np.isin(self._mat, mat)]
+
+    def linear_indices(self, shape):
+        """
+        Expand the runs into the edges they cover.  Returns the C order
+        linear indices of the edges in an array of shape (x, y, z) and the
+        material of each edge.  Runs cover [start, stop) along run_type.
+        """
+        axis = 'XYZ'.index(self._run_type)
+        (nx_dim, ny_dim, nz_dim) = [int(dim) for dim in shape]
+        starts = self.start_ind.astype(np.int64)
+        lengths = np.maximum(self._stop_ind.astype(np.int64) - starts, 0)
+        if len(self) > 0 and \
+                (int(self._x_ind.max()) >= nx_dim or
+                 int(self._y_ind.max()) >= ny_dim or
+                 int(self._z_ind.max()) >= nz_dim or
+                 int(self._stop_ind.max()) > int(shape[axis])):
+            raise IndexError("Edge runs exceed the grid dimensions.")
+
+        run_rows = np.repeat(np.arange(len(self)), lengths)
+        # position of each edge within its run
+        steps = np.arange(len(run_rows), dtype=np.int64) - \
+                np.repeat(np.cumsum(lengths) - lengths, lengths)
+        first = (self._x_ind.astype(np.int64) * ny_dim +
+                 self._y_ind) * nz_dim + self._z_ind
+        stride = (ny_dim * nz_dim, nz_dim, 1)[axis]
+        return first[run_rows] + steps * stride, self._mat[run_rows]
+
+def _read_edge_run_records(file_handle, num_edge_runs, dtype):
+    """
+    Read num_edge_runs packed records of dtype from the current position of
+    file_handle in a single read.
+    """
+    records = np.fromfile(file_handle, dtype=dtype, count=num_edge_runs)
+    if len(records) < num_edge_runs:
+        raise IOError("Unexpected end of mesh file: expected " +
+                      str(num_edge_runs) + " edge runs, read " +
+                      str(len(records)))
+    return records
+
+def read_edge_run_columns(file_handle, nedge_runs):
+    """
+    read_edge_run_columns: Helper function for XFMesh that reads a block of
+    edge run data version 0,1 in one call.  Returns contiguous columns
+    (x_ind, y_ind, z_ind, stop_ind) as uint32 arrays and mat as uint8 array.
+    file_handle: handle to open mesh.input file
+    nedge_runs: number of edge runs to read
+    """
+    records = _read_edge_run_records(file_handle, nedge_runs, EDGE_RUN_DTYPE)
+    return tuple(np.ascontiguousarray(records[name])
+                 for name in EDGE_RUN_DTYPE.names)
+
+def read_edge_run_columns_flat(file_handle, num_edge_runs):
+    """
+    read_edge_run_columns_flat: Helper function for XFMesh that reads a
+    block of version 2 (flat index) edge run data in one call.  Returns
+    contiguous columns flat_index (uint64), stop_ind (uint32) and
+    mat (uint8).
+    file_handle: handle to open mesh.input file
+    num_edge_runs: number of edge runs to read
+    """
+    records = _read_edge_run_records(file_handle, num_edge_runs,
+                                     EDGE_RUN_FLAT_DTYPE)
+    return tuple(np.ascontiguousarray(records[name])
+                 for name in EDGE_RUN_FLAT_DTYPE.names)
+
 def read_edge_run_data(file_handle, nedge_runs):
     """
     read_edge_run_data: Helper function for XFMesh that reads edge run
-    data version 0,1 and returns an instance of XFMeshEdgeRun.
+    data version 0,1 and returns a list of XFMeshEdgeRun.
     file_handle: handle to open mesh.input file
     nedge_runs: number of edge runs to read
     """
+    columns = read_edge_run_columns(file_handle, nedge_runs)
     edge_runs = []
-    for run_index in range(nedge_runs):
-        cur_run = XFMeshEdgeRun()
-        cur_run.x_ind = struct.unpack('I', file_handle.read(4))[0]
-        cur_run.y_ind = struct.unpack('I', file_handle.read(4))[0]
-        cur_run.z_ind = struct.unpack('I', file_handle.read(4))[0]
-        cur_run.stop_ind = struct.unpack('I', file_handle.read(4))[0]
-        cur_run.mat = struct.unpack('B', file_handle.read(1))[0]
-        edge_runs.append(cur_run)
+    for (x_ind, y_ind, z_ind, stop_ind, mat) in \
+            zip(*[column.tolist() for column in columns]):
+        edge_runs.append(XFMeshEdgeRun('', x_ind, y_ind, z_ind, stop_ind, mat))
 
     return edge_runs
 
@@ -184,6 +373,66 @@ def dijk_from_flat_index(flat_index, nx_cells, ny_cells, nz_cells):
 
     return edge_d, edge_i, edge_j, edge_k
 
+def dijk_from_flat_indices(flat_indices, nx_cells, ny_cells, nz_cells):
+    """
+    dijk_from_flat_indices: Vectorized dijk_from_flat_index.  Decodes an
+    array of mesh.input version 2 flat indices with integer divmod and
+    returns the D, i, j, k arrays.
+    flat_indices: uint64 array of flat indices
+    n{x,y,z}_cells: number of {x,y,z} cells in grid from the mesh.input header.
+    """
+    flat_indices = np.asarray(flat_indices, dtype=np.uint64)
+    (edge_d, remainder) = np.divmod(flat_indices,
+                                    np.uint64(nx_cells*ny_cells*nz_cells))
+    (edge_i, remainder) = np.divmod(remainder, np.uint64(ny_cells*nz_cells))
+    (edge_j, edge_k) = np.divmod(remainder, np.uint64(nz_cells))
+
+    return edge_d, edge_i, edge_j, edge_k
+
+def edge_run_tables_from_flat(flat_indices, grid_stops, run_mats, nx_cells,
+                              ny_cells, nz_cells):
+    """
+    edge_run_tables_from_flat: Helper function for XFMesh that decodes the
+    columns of a version 2 edge run block and returns the X, Y and Z
+    direction runs as three XFMeshEdgeRunTable, keeping the file order
+    within each direction.
+    flat_indices, grid_stops, run_mats: edge run block columns
+    n{x,y,z}_cells: number of {x,y,z} cells in grid from the mesh.input header.
+    """
+    (edge_d, edge_i, edge_j, edge_k) = dijk_from_flat_indices(flat_indices,
+                                                              nx_cells,
+                                                              ny_cells,
+                                                              nz_cells)
+    if np.any(edge_d > 2):
+        raise IOError("Invalid edge direction in mesh file flat index.")
+
+    # group runs by direction, stable so each direction keeps file order
+    order = np.argsort(edge_d, kind='stable')
+    bounds = np.cumsum(np.bincount(edge_d.astype(np.intp), minlength=3))
+    tables = []
+    for (direction, run_type) in enumerate(('X', 'Y', 'Z')):
+        rows = order[(bounds[direction - 1] if direction > 0 else 0):
+                     bounds[direction]]
+        tables.append(XFMeshEdgeRunTable(run_type, edge_i[rows], edge_j[rows],
+                                         edge_k[rows], grid_stops[rows],
+                                         run_mats[rows]))
+    return tables
+
+def read_edge_run_tables_flat(file_handle, num_edge_runs, nx_cells, ny_cells,
+                              nz_cells):
+    """
+    read_edge_run_tables_flat: Helper function for XFMesh that reads a block
+    of version 2 edge run data and returns the X, Y and Z direction runs as
+    three XFMeshEdgeRunTable, keeping the file order within each direction.
+    file_handle: handle to open mesh.input file
+    num_edge_runs: number of edge runs to read
+    n{x,y,z}_cells: number of {x,y,z} cells in grid from the mesh.input header.
+    """
+    (flat_indices, grid_stops, run_mats) = \
+        read_edge_run_columns_flat(file_handle, num_edge_runs)
+    return edge_run_tables_from_flat(flat_indices, grid_stops, run_mats,
+                                     nx_cells, ny_cells, nz_cells)
+
 def read_edge_run_data_flat(file_handle, num_edge_runs, nx_cells, ny_cells, nz_cells):
     """
     read_edge_run_data_flat: Helper function for XFMesh that reads edge run data
@@ -193,33 +442,41 @@ def read_edge_run_data_flat(file_handle, num_edge_runs, nx_cells, ny_cells, nz_c
     nedge_runs: number of edge runs to read
     n{x,y,z}_cells: number of {x,y,z} cells in grid from the mesh.input header.
     """
+    (flat_indices, grid_stops, run_mats) = \
+        read_edge_run_columns_flat(file_handle, num_edge_runs)
+    (edge_d, edge_i, edge_j, edge_k) = dijk_from_flat_indices(flat_indices,
+                                                              nx_cells,
+                                                              ny_cells,
+                                                              nz_cells)
+    run_types = ('X', 'Y', 'Z')
     edge_runs = []
-    for run_index in range(num_edge_runs):
-
-        flat_edge_index = struct.unpack('Q', file_handle.read(8))[0]
-        grid_stop = struct.unpack('I', file_handle.read(4))[0]
-        run_mat = struct.unpack('B', file_handle.read(1))[0]
-        edge_d,edge_i,edge_j,edge_k = dijk_from_flat_index(flat_edge_index,
-                                                           nx_cells,
-                                                           ny_cells,
-                                                           nz_cells)
-        if edge_d == 0:
-            run_type = 'X'
-        elif edge_d == 1:
-            run_type = 'Y'
-        elif edge_d == 2:
-            run_type = 'Z'
-
-        cur_run = XFMeshEdgeRun(run_type, edge_i, edge_j, edge_k, grid_stop, run_mat)
-        edge_runs.append(cur_run)
+    for (run_d, run_i, run_j, run_k, grid_stop, run_mat) in \
+            zip(edge_d.tolist(), edge_i.tolist(), edge_j.tolist(),
+                edge_k.tolist(), grid_stops.tolist(), run_mats.tolist()):
+        run_type = run_types[run_d] if run_d < 3 else ''
+        edge_runs.append(XFMeshEdgeRun(run_type, run_i, run_j, run_k,
+                                       grid_stop, run_mat))
 
     return edge_runs
 
 class XFMesh(object):
     """
     Process mesh.input file
+
+    Only the header is read on construction.  mesh.input is memory mapped
+    and the edge runs of a direction are decoded when its property is
+    first accessed (for version 2 files the whole E or H block is decoded
+    together, as the directions are interleaved).
+
+    If cache_dir (or the XFMOD_CACHE_DIR environment variable) is set, the
+    decoded edge runs are stored there, keyed by the mesh.input contents,
+    and later loads memory-map the stored columns.  Each direction
+    (version 2: each E or H block) is cached separately as it is first
+    used.  Entries of a replaced mesh.input are removed when the new one is
+    first read; XFArrayCache(cache_dir, MESH_CACHE_KIND).prune bounds the
+    cache by age and size.
     """
-    def __init__(self, xf_project_dir, sim_id, run_id):
+    def __init__(self, xf_project_dir, sim_id, run_id, cache_dir=None):
         self._mesh_input_file_path = os.path.join(xf_project_dir,
                                                   r'Simulations',
                                                   xf_sim_id_to_str(sim_id),
@@ -231,15 +488,15 @@ class XFMesh(object):
         self._num_ex_edge_runs = 0
         self._num_ey_edge_runs = 0
         self._num_ez_edge_runs = 0
-        self._ex_edge_runs = []
-        self._ey_edge_runs = []
-        self._ez_edge_runs = []
+        self._ex_edge_runs = None
+        self._ey_edge_runs = None
+        self._ez_edge_runs = None
         self._num_hx_edge_runs = 0
         self._num_hy_edge_runs = 0
         self._num_hz_edge_runs = 0
-        self._hx_edge_runs = []
-        self._hy_edge_runs = []
-        self._hz_edge_runs = []
+        self._hx_edge_runs = None
+        self._hy_edge_runs = None
+        self._hz_edge_runs = None
         self._num_e_avg_mats = 0
         self._num_h_avg_mats = 0
         self._num_e_mesh_edges_e_avg = 0
@@ -250,13 +507,15 @@ class XFMesh(object):
         self._num_x_cells = None
         self._num_y_cells = None
         self._num_z_cells = None
+        self._mesh_map = None
+        self._cache_dir = xf_cache_dir(cache_dir)
+        self._mesh_array_cache = None
+        self._cache_key = None
         self._read_mesh_header()
         print("Edge Runs: ")
         print("X: ", self._num_ex_edge_runs)
         print("Y: ", self._num_ey_edge_runs)
         print("Z: ", self._num_ez_edge_runs)
-        self._read_edge_run_data()
-
 
     def _read_mesh_header(self):
         """Read the mesh header."""
@@ -326,104 +585,275 @@ class XFMesh(object):
             return
         file_handle.close()
 
-    def _read_edge_run_data(self):
-        """Read Edge run data"""
-        file_handle = open(self._mesh_input_file_path, 'rb')
-        file_handle.seek(self._start_ex_edge_run)
+    def _map_mesh_file(self):
+        """Return the read-only memory map of mesh.input."""
+        if self._mesh_map is None:
+            self._mesh_map = np.memmap(self._mesh_input_file_path,
+                                       dtype=np.uint8, mode='r')
+        return self._mesh_map
+
+    def _mesh_records(self, offset, num_records, dtype):
+        """
+        Return num_records records of dtype at byte offset of the memory
+        mapped mesh.input.
+        """
+        if num_records == 0:
+            return np.zeros(0, dtype=dtype)
+        end = offset + num_records * dtype.itemsize
+        if end > len(self._map_mesh_file()):
+            raise IOError("Unexpected end of mesh file: " +
+                          self._mesh_input_file_path)
+        return self._mesh_map[offset:end].view(dtype)
+
+    def _section_offsets(self):
+        """
+        Return the byte offsets of the edge run sections.  For versions 0,1
+        these are the Ex, Ey, Ez, Hx, Hy, Hz sections; for version 2 the E
+        and H blocks.  The last offset is the end of the edge run data.
+        """
+        if self._mesh_version < 2:
+            section_runs = [self._num_ex_edge_runs, self._num_ey_edge_runs,
+                            self._num_ez_edge_runs, self._num_hx_edge_runs,
+                            self._num_hy_edge_runs, self._num_hz_edge_runs]
+            run_bytes = EDGE_RUN_DTYPE.itemsize
+        else:
+            section_runs = [self._num_ex_edge_runs + self._num_ey_edge_runs +
+                            self._num_ez_edge_runs,
+                            self._num_hx_edge_runs + self._num_hy_edge_runs +
+                            self._num_hz_edge_runs]
+            run_bytes = EDGE_RUN_FLAT_DTYPE.itemsize
+        offsets = [self._start_ex_edge_run]
+        for num_runs in section_runs:
+            offsets.append(offsets[-1] + num_runs * run_bytes)
+        return offsets
+
+    def _mesh_cache(self):
+        """
+        Return the on-disk cache of this mesh.input and its content key,
+        (None, None) if caching is off.
+        """
+        if self._cache_dir is None or self._mesh_version is None:
+            return None, None
+        if self._cache_key is None:
+            self._mesh_array_cache = XFArrayCache(self._cache_dir,
+                                                  MESH_CACHE_KIND)
+            self._cache_key = self._mesh_array_cache.source_key(
+                self._mesh_input_file_path)
+        return self._mesh_array_cache, self._cache_key
+
+    def _cache_section_directions(self, section):
+        """Return the edge run directions stored in cache section."""
+        if section in EDGE_RUN_DIRECTIONS:
+            return [section]
+        return [section + run_type for run_type in 'xyz']
+
+    def _load_cache(self, section):
+        """
+        Fill section from the on-disk cache: the edge runs of one direction
+        ('ex' ... 'hz') for versions 0,1, or of the 'e' or 'h' block for
+        version 2.  Returns False if caching is off or the section is not
+        cached yet.
+        """
+        (cache, key) = self._mesh_cache()
+        if cache is None:
+            return False
+        arrays = cache.load(key + '-' + section)
+        if arrays is None:
+            return False
+
+        for name in self._cache_section_directions(section):
+            setattr(self, '_' + name + '_edge_runs', XFMeshEdgeRunTable(
+                name[1].upper(), *[arrays[name + '_' + column]
+                                   for column in _EDGE_RUN_COLUMNS]))
+        return True
+
+    def _save_cache(self, section):
+        """Store the decoded section in the on-disk cache, if caching is on."""
+        (cache, key) = self._mesh_cache()
+        if cache is None:
+            return
+        print("Caching decoded mesh " + section + " in " + cache.cache_dir)
+        arrays = dict()
+        for name in self._cache_section_directions(section):
+            table = getattr(self, '_' + name + '_edge_runs')
+            for column in _EDGE_RUN_COLUMNS:
+                arrays[name + '_' + column] = getattr(table, column)
+        cache.save(key + '-' + section, arrays)
+
+    def _edge_run_table(self, field_type, run_type):
+        """
+        Decode and store the edge runs of field_type ('E' or 'H') and
+        run_type ('X', 'Y' or 'Z').
+        """
+        if self._mesh_version is None:
+            setattr(self, '_' + field_type.lower() + run_type.lower() +
+                    '_edge_runs', XFMeshEdgeRunTable(run_type))
+            return
         if self._mesh_version < 2:
-            # read Ex edges
-            if self._num_ex_edge_runs > 0:
-                self._ex_edge_runs = read_edge_run_data(file_handle,
-                                                        self._num_ex_edge_runs)
-            # read Ey edges
-            if self._num_ey_edge_runs > 0:
-                self._ey_edge_runs = read_edge_run_data(file_handle,
-                                                    self._num_ey_edge_runs)
-            # read Ez edges
-            if self._num_ez_edge_runs > 0:
-                self._ez_edge_runs = read_edge_run_data(file_handle,
-                                                        self._num_ez_edge_runs)
-            # read Hx edges
-            if self._num_hx_edge_runs > 0:
-                self._hx_edge_runs = read_edge_run_data(file_handle,
-                                                        self._num_hx_edge_runs)
-            # read Hy edges
-            if self._num_hy_edge_runs > 0:
-                self._hy_edge_runs = read_edge_run_data(file_handle,
-                                                        self._num_hy_edge_runs)
-            # read Hz edges
-            if self._num_hz_edge_runs > 0:
-                self._hz_edge_runs = read_edge_run_data(file_handle,
-                                                        self._num_hz_edge_runs)
-
-        # read runs from mesh.input version 2 and higher
+            section = field_type.lower() + run_type.lower()
         else:
+            section = field_type.lower()
+        if self._load_cache(section):
+            return
 
-            num_e_runs = self._num_ex_edge_runs + \
-                         self._num_ey_edge_runs + \
-                         self._num_ez_edge_runs
-            num_h_runs = self._num_hx_edge_runs + \
-                         self._num_hy_edge_runs + \
-                         self._num_hz_edge_runs
-
-            # read E field edge runs first, then H field runs
-            edge_e_runs = read_edge_run_data_flat(file_handle,
-                                                  num_e_runs,
-                                                  self._num_x_cells,
-                                                  self._num_y_cells,
-                                                  self._num_z_cells)
-            edge_h_runs = read_edge_run_data_flat(file_handle,
-                                                  num_h_runs,
-                                                  self._num_x_cells,
-                                                  self._num_y_cells,
-                                                  self._num_z_cells)
-
-            for edge_run in edge_e_runs:
-                if edge_run.run_type == 'X':
-                    self._ex_edge_runs.append(edge_run)
-                elif edge_run.run_type == 'Y':
-                    self._ey_edge_runs.append(edge_run)
-                elif edge_run.run_type == 'Z':
-                    self._ez_edge_runs.append(edge_run)
-
-            for edge_run in edge_h_runs:
-                if edge_run.run_type == 'X':
-                    self._hx_edge_runs.append(edge_run)
-                elif edge_run.run_type == 'Y':
-                    self._hy_edge_runs.append(edge_run)
-                elif edge_run.run_type == 'Z':
-                    self._hz_edge_runs.append(edge_run)
-
-        # TODO: Averaged material definitions
-        # this is not implemented yet.
-        file_handle.close()
+        if self._mesh_version < 2:
+            section_index = EDGE_RUN_DIRECTIONS.index(section)
+            num_runs = getattr(self, '_num_' + section + '_edge_runs')
+            records = self._mesh_records(
+                self._section_offsets()[section_index], num_runs,
+                EDGE_RUN_DTYPE)
+            setattr(self, '_' + section + '_edge_runs', XFMeshEdgeRunTable(
+                run_type, records['x_ind'], records['y_ind'],
+                records['z_ind'], records['stop_ind'], records['mat']))
+        else:
+            self._decode_flat_block(field_type)
+        self._save_cache(section)
+
+    def _decode_flat_block(self, field_type):
+        """Decode the version 2 E or H edge run block into all directions."""
+        block = 'EH'.index(field_type)
+        offsets = self._section_offsets()
+        num_runs = (offsets[block + 1] - offsets[block]) // \
+                   EDGE_RUN_FLAT_DTYPE.itemsize
+        records = self._mesh_records(offsets[block], num_runs,
+                                     EDGE_RUN_FLAT_DTYPE)
+        tables = edge_run_tables_from_flat(records['flat_index'],
+                                           records['stop_ind'],
+                                           records['mat'],
+                                           self._num_x_cells,
+                                           self._num_y_cells,
+                                           self._num_z_cells)
+        for (run_type, table) in zip('xyz', tables):
+            setattr(self, '_' + field_type.lower() + run_type +
+                    '_edge_runs', table)
+
+    def iter_edge_runs(self, field_type, run_type,
+                       batch_runs=EDGE_RUN_BATCH_RUNS):
+        """
+        Yield the edge runs of field_type ('E' or 'H') and run_type ('X',
+        'Y' or 'Z') in file order as XFMeshEdgeRunTable batches of at most
+        batch_runs runs, read straight from the memory mapped mesh.input.
+        Nothing is stored on the XFMesh, so meshes larger than memory can be
+        processed batch by batch.
+        """
+        if batch_runs < 1:
+            raise ValueError("batch_runs must be positive.")
+        field_type = field_type.upper()
+        run_type = run_type.upper()
+        if field_type not in ('E', 'H') or run_type not in ('X', 'Y', 'Z'):
+            raise ValueError("Invalid edge run type: " + field_type + run_type)
+        if self._mesh_version is None:
+            return
+
+        offsets = self._section_offsets()
+        if self._mesh_version < 2:
+            section = 'EH'.index(field_type) * 3 + 'XYZ'.index(run_type)
+            num_runs = (offsets[section + 1] - offsets[section]) // \
+                       EDGE_RUN_DTYPE.itemsize
+            for start in range(0, num_runs, batch_runs):
+                records = self._mesh_records(
+                    offsets[section] + start * EDGE_RUN_DTYPE.itemsize,
+                    min(batch_runs, num_runs - start), EDGE_RUN_DTYPE)
+                yield XFMeshEdgeRunTable(run_type, records['x_ind'],
+                                         records['y_ind'], records['z_ind'],
+                                         records['stop_ind'], records['mat'])
+            return
+
+        # version 2 blocks interleave the directions; keep those requested
+        block = 'EH'.index(field_type)
+        direction = 'XYZ'.index(run_type)
+        num_runs = (offsets[block + 1] - offsets[block]) // \
+                   EDGE_RUN_FLAT_DTYPE.itemsize
+        for start in range(0, num_runs, batch_runs):
+            records = self._mesh_records(
+                offsets[block] + start * EDGE_RUN_FLAT_DTYPE.itemsize,
+                min(batch_runs, num_runs - start), EDGE_RUN_FLAT_DTYPE)
+            table = edge_run_tables_from_flat(records['flat_index'],
+                                              records['stop_ind'],
+                                              records['mat'],
+                                              self._num_x_cells,
+                                              self._num_y_cells,
+                                              self._num_z_cells)[direction]
+            if len(table) > 0:
+                yield table
+
+    def _read_edge_run_data(self):
+        """Decode the edge runs of all six directions."""
+        for field_type in 'EH':
+            for run_type in 'XYZ':
+                self._edge_run_table(field_type, run_type)
+        # TODO: Averaged material definitions.  The sections following the
+        # edge runs are not decoded until their record layout can be
+        # checked against a mesh.input with averaged edges.
+
+    @property
+    def num_ex_edge_runs(self):
+        """Return the number of Ex edge runs from the mesh header."""
+        return self._num_ex_edge_runs
+
+    @property
+    def num_ey_edge_runs(self):
+        """Return the number of Ey edge runs from the mesh header."""
+        return self._num_ey_edge_runs
+
+    @property
+    def num_ez_edge_runs(self):
+        """Return the number of Ez edge runs from the mesh header."""
+        return self._num_ez_edge_runs
+
+    @property
+    def num_hx_edge_runs(self):
+        """Return the number of Hx edge runs from the mesh header."""
+        return self._num_hx_edge_runs
+
+    @property
+    def num_hy_edge_runs(self):
+        """Return the number of Hy edge runs from the mesh header."""
+        return self._num_hy_edge_runs
+
+    @property
+    def num_hz_edge_runs(self):
+        """Return the number of Hz edge runs from the mesh header."""
+        return self._num_hz_edge_runs
 
     @property
     def ex_edge_runs(self):
-        """Retrun Ex edge runs."""
+        """Return Ex edge runs as an XFMeshEdgeRunTable."""
+        if self._ex_edge_runs is None:
+            self._edge_run_table('E', 'X')
         return self._ex_edge_runs
 
     @property
     def ey_edge_runs(self):
-        """Retrun Ey edge runs."""
+        """Return Ey edge runs as an XFMeshEdgeRunTable."""
+        if self._ey_edge_runs is None:
+            self._edge_run_table('E', 'Y')
         return self._ey_edge_runs
 
     @property
     def ez_edge_runs(self):
-        """Retrun Ez edge runs."""
+        """Return Ez edge runs as an XFMeshEdgeRunTable."""
+        if self._ez_edge_runs is None:
+            self._edge_run_table('E', 'Z')
         return self._ez_edge_runs
 
     @property
     def hx_edge_runs(self):
-        """Retrun Hx edge runs."""
+        """Return Hx edge runs as an XFMeshEdgeRunTable."""
+        if self._hx_edge_runs is None:
+            self._edge_run_table('H', 'X')
         return self._hx_edge_runs
 
     @property
     def hy_edge_runs(self):
-        """Retrun Hy edge runs."""
+        """Return Hy edge runs as an XFMeshEdgeRunTable."""
+        if self._hy_edge_runs is None:
+            self._edge_run_table('H', 'Y')
         return self._hy_edge_runs
 
     @property
     def hz_edge_runs(self):
-        """Return Hz edge runs."""
+        """Return Hz edge runs as an XFMeshEdgeRunTable."""
+        if self._hz_edge_runs is None:
+            self._edge_run_table('H', 'Z')
         return self._hz_edge_runs
@@ -0,0 +1,231 @@
+"""
+Summary statistics of the edge runs in an XFdtd mesh.input file.
+"""
+
+# Ensure python 2 and 3 compatibility
+from __future__ import (absolute_import, division, generators,
+                        print_function, unicode_literals)
+
+import os
+import sys
+import getopt
+from collections import OrderedDict
+import numpy as np
+from xfmod.xfutils import xf_is_string
+from xfmod.xfgeomod.xfmesh import (XFMesh, EDGE_RUN_BATCH_RUNS,
+                                   EDGE_RUN_DIRECTIONS)
+from xfmod.xfgeomod.xfgeometry import XFGeometry
+
+# Edge run materials are stored as one byte in mesh.input
+NUM_MESH_MATERIALS = 256
+
+class XFMeshStats(object):
+    """
+    Run counts, edge counts per material, run length histograms and
+    material bounding boxes of an XFMesh.  The edge runs are streamed with
+    XFMesh.iter_edge_runs, so the statistics of a direction are computed in
+    bounded memory the first time any of them is requested.
+    """
+    def __init__(self, xf_mesh, batch_runs=EDGE_RUN_BATCH_RUNS):
+        self._xf_mesh = xf_mesh
+        self._batch_runs = batch_runs
+        self._edge_counts = dict()
+        self._run_lengths = dict()
+        self._bbox_min = dict()
+        self._bbox_max = dict()
+
+    def _check_direction(self, direction):
+        """Return direction in lower case, raising ValueError if unknown."""
+        direction = direction.lower()
+        if direction not in EDGE_RUN_DIRECTIONS:
+            raise ValueError("Invalid edge run direction: " + direction)
+        return direction
+
+    def _directions(self, directions):
+        """Return the checked list of directions, all if None."""
+        if directions is None:
+            return list(EDGE_RUN_DIRECTIONS)
+        if xf_is_string(directions):
+            directions = [directions]
+        return [self._check_direction(direction) for direction in directions]
+
+    def _accumulate(self, direction):
+        """Stream the runs of direction and store its statistics."""
+        if direction in self._edge_counts:
+            return
+        axis = 'xyz'.index(direction[1])
+        edge_counts = np.zeros(NUM_MESH_MATERIALS, dtype=np.int64)
+        run_lengths = np.zeros(0, dtype=np.int64)
+        bbox_min = np.full((NUM_MESH_MATERIALS, 3), np.iinfo(np.int64).max,
+                           dtype=np.int64)
+        bbox_max = np.full((NUM_MESH_MATERIALS, 3), -1, dtype=np.int64)
+        for table in self._xf_mesh.iter_edge_runs(direction[0], direction[1],
+                                                  self._batch_runs):
+            mats = table.mat.astype(np.intp)
+            lengths = table.stop_ind.astype(np.int64) - \
+                      table.start_ind.astype(np.int64)
+            lengths = np.maximum(lengths, 0)
+            edge_counts += np.bincount(mats, weights=lengths,
+                                       minlength=NUM_MESH_MATERIALS
+                                      ).astype(np.int64)
+            batch_lengths = np.bincount(lengths)
+            if len(batch_lengths) > len(run_lengths):
+                run_lengths = np.concatenate(
+                    (run_lengths, np.zeros(len(batch_lengths) -
+                                           len(run_lengths), dtype=np.int64)))
+            run_lengths[:len(batch_lengths)] += batch_lengths
+
+            # bounding box of the edges, runs cover [start, stop) along axis
+            keep = lengths > 0
+            first = np.column_stack((table.x_ind, table.y_ind,
+                                     table.z_ind)).astype(np.int64)[keep]
+            last = first.copy()
+            last[:, axis] += lengths[keep] - 1
+            np.minimum.at(bbox_min, mats[keep], first)
+            np.maximum.at(bbox_max, mats[keep], last)
+
+        self._edge_counts[direction] = edge_counts
+        self._run_lengths[direction] = run_lengths
+        self._bbox_min[direction] = bbox_min
+        self._bbox_max[direction] = bbox_max
+
+    @property
+    def xf_mesh(self):
+        """Return the XFMesh summarized."""
+        return self._xf_mesh
+
+    @property
+    def run_counts(self):
+        """Return the number of edge runs of each direction from the header."""
+        return OrderedDict((direction, getattr(self._xf_mesh, 'num_' +
+                                               direction + '_edge_runs'))
+                           for direction in EDGE_RUN_DIRECTIONS)
+
+    def edge_counts(self, directions=None):
+        """
+        Return the number of mesh edges of each material number, summed
+        over directions (a direction such as 'ex' or a list, all if None).
+        """
+        counts = np.zeros(NUM_MESH_MATERIALS, dtype=np.int64)
+        for direction in self._directions(directions):
+            self._accumulate(direction)
+            counts += self._edge_counts[direction]
+        return counts
+
+    def run_length_histogram(self, directions=None):
+        """
+        Return the number of edge runs of each length (in edges), summed
+        over directions.
+        """
+        histogram = np.zeros(1, dtype=np.int64)
+        for direction in self._directions(directions):
+            self._accumulate(direction)
+            run_lengths = self._run_lengths[direction]
+            if len(run_lengths) > len(histogram):
+                histogram = np.concatenate(
+                    (histogram, np.zeros(len(run_lengths) - len(histogram),
+                                         dtype=np.int64)))
+            histogram[:len(run_lengths)] += run_lengths
+        return histogram
+
+    def bounding_boxes(self, directions=None):
+        """
+        Return a dict of material number to the (min, max) inclusive cell
+        index bounds of its edges over directions.  Materials without edges
+        are left out.
+        """
+        bbox_min = np.full((NUM_MESH_MATERIALS, 3), np.iinfo(np.int64).max,
+                           dtype=np.int64)
+        bbox_max = np.full((NUM_MESH_MATERIALS, 3), -1, dtype=np.int64)
+        for direction in self._directions(directions):
+            self._accumulate(direction)
+            np.minimum(bbox_min, self._bbox_min[direction], out=bbox_min)
+            np.maximum(bbox_max, self._bbox_max[direction], out=bbox_max)
+        return dict((mat, (tuple(bbox_min[mat].tolist()),
+                           tuple(bbox_max[mat].tolist())))
+                    for mat in np.flatnonzero(bbox_max[:, 0] >= 0).tolist())
+
+    def report(self, directions=None, materials_list=None):
+        """
+        Return the statistics as text.  materials_list, as returned by
+        XFGeometry.load_materials, supplies material names.
+        """
+        directions = self._directions(directions)
+        lines = ["Edge runs:"]
+        for (direction, num_runs) in self.run_counts.items():
+            lines.append("  %s: %d" % (direction.capitalize(), num_runs))
+
+        histogram = self.run_length_histogram(directions)
+        num_runs = histogram.sum()
+        if num_runs > 0:
+            lengths = np.arange(len(histogram))
+            nonzero = np.flatnonzero(histogram)
+            lines.append("Run length (edges): min %d, mean %.2f, max %d" %
+                         (nonzero[0], (lengths * histogram).sum() / num_runs,
+                          nonzero[-1]))
+
+        edge_counts = self.edge_counts(directions)
+        bounding_boxes = self.bounding_boxes(directions)
+        lines.append("Material edges (" + ", ".join(
+            direction.capitalize() for direction in directions) + "):")
+        for mat in np.flatnonzero(edge_counts).tolist():
+            name = ''
+            if (materials_list is not None and mat < len(materials_list) and
+                    materials_list[mat] is not None):
+                name = materials_list[mat].name
+            (bbox_min, bbox_max) = bounding_boxes[mat]
+            lines.append("  %3d %-24s %12d  [%d:%d, %d:%d, %d:%d]" %
+                         (mat, name, edge_counts[mat],
+                          bbox_min[0], bbox_max[0], bbox_min[1],
+                          bbox_max[1], bbox_min[2], bbox_max[2]))
+        return "\n".join(lines)
+
+def usage(exit_status=None):
+    """Print usage and exit."""
+    print("Usage: xfmeshstats.py --xf_project=<project> --sim=<id> "
+          "--run=<id> [--directions=ex,ey,ez]")
+    print("  --xf_project: XFdtd project directory.")
+    print("  --sim, --run: simulation and run numbers.")
+    print("  --directions: comma separated edge run directions to summarize, "
+          "default all.")
+    print("")
+    if exit_status:
+        sys.exit(exit_status)
+    else:
+        sys.exit()
+
+def main(argv):
+    """Parse command line arguments and print the mesh statistics."""
+    arg_dict = {'directions': None}
+    try:
+        opts, _ = getopt.getopt(argv, 'h', ['help', 'xf_project=', 'sim=',
+                                            'run=', 'directions='])
+    except getopt.GetoptError as e:
+        print("Bad argument Getopt: ", e.msg)
+        usage(2)
+
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            usage()
+        arg_dict[opt[2:]] = arg
+
+    for key in ('xf_project', 'sim', 'run'):
+        if key not in arg_dict:
+            print("Missing --" + key)
+            usage(2)
+    if not os.path.exists(arg_dict['xf_project']):
+        print("XFdtd project (", arg_dict['xf_project'], ") not found.")
+        usage(2)
+
+    directions = arg_dict['directions']
+    if directions is not None:
+        directions = directions.split(',')
+
+    xf_mesh = XFMesh(arg_dict['xf_project'], int(arg_dict['sim']),
+                     int(arg_dict['run']))
+    materials_list = XFGeometry(arg_dict['xf_project'], int(arg_dict['sim']),
+                                int(arg_dict['run'])).load_materials()
+    print(XFMeshStats(xf_mesh).report(directions, materials_list))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
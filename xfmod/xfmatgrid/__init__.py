@@ -7,5 +7,7 @@ from __future__ import (absolute_import, division, generators,
 from .xfmultipoint import (XFMultiPointInfo,
                            XFMultiPointGeometry,
                            XFMultiPointFrequencies,
-                           XFMultiPointSSField)
+                           XFMultiPointSSField,
+                           XFMultiPointSparseField,
+                           XFMultiPointFrequencyField)
 from .xfmatgrid import XFFieldNonUniformGrid
@@ -12,14 +12,30 @@ import numpy as np
 from xfmod.xfmatgrid.xfmultipoint import (XFMultiPointInfo,
                                           XFMultiPointFrequencies,
                                           XFMultiPointGeometry,
-                                          XFMultiPointSSField)
-from xfmod.xfutils import xf_sim_id_to_str, xf_run_id_to_str
+                                          XFMultiPointSSField,
+                                          XFMultiPointSparseField,
+                                          XFMultiPointFrequencyField,
+                                          read_mp_field_values)
+from xfmod.xfutils import xf_sim_id_to_str, xf_run_id_to_str, XFLRUCache
 from xfmod.xfgeomod import XFGeometry
 
+# Default memory budget for field cubes kept by XFFieldNonUniformGrid
+FIELD_CACHE_BYTES = 512 * 1024 * 1024
 
 class XFFieldNonUniformGrid(object):
-    """Holds XF field data on non-uniform grid."""
-    def __init__(self, xf_project_dir, sim_id, run_id, mp_sensor_name):
+    """
+    Holds XF field data on non-uniform grid.
+
+    Field cubes read by ss_field_data are kept, read-only, in a least
+    recently used cache of at most cache_bytes (None for unbounded, 0 to
+    disable) so repeated requests do not reread the sensor files.
+
+    Construction only records the project, simulation, run and sensor.  The
+    sensor info, frequencies, geometry and project grid are each loaded on
+    first use.
+    """
+    def __init__(self, xf_project_dir, sim_id, run_id, mp_sensor_name,
+                 cache_bytes=FIELD_CACHE_BYTES):
         self._valid_types = [r'E', r'H', r'B', r'J']
         self._valid_components = [r'x', r'y', r'z']
         self._project_dir = xf_project_dir
@@ -28,33 +44,32 @@ class XFFieldNonUniformGrid(object):
         self._mp_sensor_name = mp_sensor_name
         self._mp_sensor_name_re  = r'(.*)(MultiPoint_' + mp_sensor_name \
                                    + r'_[0-9]+)'
+        self._ss_field_data = np.zeros(1)
+        self._field_cache = XFLRUCache(max_bytes=cache_bytes)
+        self._reset()
+
+    def _reset(self):
+        """Discard all lazily loaded sensor and grid data."""
         self._mp_ss_info_file = []
         self._mp_ss_info = None
-        self._set_mp_info(r'MultiPoint_' + mp_sensor_name + '*_info.bin')
-        self._set_data_dirs()
-        self._mp_field_types = []
-        self._xdim = np.zeros(1)
-        self._ydim = np.zeros(1)
-        self._zdim = np.zeros(1)
-        self._ss_field_data = np.zeros(1)
-        self._get_mp_field_types()
-        self._load_geom()
-        self._xf_grid = XFGeometry(xf_project_dir, sim_id, run_id)
-        self._load_mp_ss_grid()
+        self._mp_frequencies_file = None
+        self._mp_geom_file = None
+        self._mp_freq = None
+        self._mp_geom = None
+        self._mp_field_types = None
+        self._xf_grid = None
+        self._xdim = None
+        self._ydim = None
+        self._zdim = None
+        self._field_cache.clear()
 
     def _load_mp_ss_grid(self):
         """Loads subregion of grid encompassing the multipoint solid sensor."""
-        # get multipoint solid sensor x-values
-        temp_dim = np.array(self._xf_grid.grid_data.x_coods())
-        self._xdim = temp_dim[self._mp_geom.x_domain]
-
-        # get multipoint solid sensor y-values
-        temp_dim = np.array(self._xf_grid.grid_data.y_coods())
-        self._ydim = temp_dim[self._mp_geom.y_domain]
-
-        # get multipoint solid sensor z-values
-        temp_dim = np.array(self._xf_grid.grid_data.z_coods())
-        self._zdim = temp_dim[self._mp_geom.z_domain]
+        grid_data = self.xf_grid.grid_data
+        # get multipoint solid sensor x, y and z values
+        self._xdim = grid_data.x_coods()[self.mp_geometry.x_domain]
+        self._ydim = grid_data.y_coods()[self.mp_geometry.y_domain]
+        self._zdim = grid_data.z_coods()[self.mp_geometry.z_domain]
 
     def _set_mp_info(self, mp_ss_info_file_name):
         """Load multipoint sensor info."""
@@ -73,10 +88,10 @@ class XFFieldNonUniformGrid(object):
             print("Could not find project: " + self._project_dir)
 
     def _set_data_dirs(self):
-        """Set the project directory and set sensor file location."""
+        """Set the sensor frequencies and geometry file locations."""
         try:
-            print(self._mp_ss_info_file[0])
-            
+            print(self.mp_ss_info_file)
+
         except:
             print("[Warning] Multipoint Sensor data file missing.")
             print("self._mp_ss_info_file")
@@ -87,7 +102,7 @@ class XFFieldNonUniformGrid(object):
 
         try:
             mp_sensor_dir = re.match(self._mp_sensor_name_re,
-                                     self._mp_ss_info_file[0])
+                                     self.mp_ss_info_file)
             self._mp_frequencies_file = os.path.join(mp_sensor_dir.group(1),
                                                      mp_sensor_dir.group(2),
                                                      r'frequencies.bin')
@@ -96,12 +111,10 @@ class XFFieldNonUniformGrid(object):
             print("MPSensor name: " , self._mp_sensor_name)
             raise
 
-            self._mp_freq = XFMultiPointFrequencies(self._mp_frequencies_file)
-            self._mp_geom_file = os.path.join(mp_sensor_dir.group(1),
-                                              mp_sensor_dir.group(2),
-                                              r'geom.bin')
+        self._mp_geom_file = os.path.join(mp_sensor_dir.group(1),
+                                          mp_sensor_dir.group(2),
+                                          r'geom.bin')
 
-            
     def _get_mp_field_types(self):
         """
         Determine which data directories should be present from info flags.
@@ -119,7 +132,8 @@ class XFFieldNonUniformGrid(object):
         discrete_frequency_total_b = 1<<21
         discrete_frequency_dissipated_power_density = 1<<20
 
-        mask = self._mp_ss_info.fields_mask
+        self._mp_field_types = []
+        mask = self.mp_ss_info.fields_mask
 
         if mask & time_domain_scattered_e:
             self._mp_field_types.append(r'tr_Exs')
@@ -190,23 +204,71 @@ class XFFieldNonUniformGrid(object):
         print(r"Loading geom.bin")
         if os.path.exists(self._mp_geom_file):
             self._mp_geom = XFMultiPointGeometry(self._mp_geom_file,
-                                                 self._mp_ss_info.num_points)
+                                                 self.mp_ss_info.num_points)
         else:
             print(r"Could not find geometry file: " + self._mp_geom_file)
 
+    @property
+    def mp_ss_info_file(self):
+        """Return the multipoint sensor info file name."""
+        if not self._mp_ss_info_file:
+            self._set_mp_info(r'MultiPoint_' + self._mp_sensor_name +
+                              '*_info.bin')
+        return self._mp_ss_info_file[0]
+
+    @property
+    def mp_ss_info(self):
+        """Return the multipoint sensor XFMultiPointInfo."""
+        if self._mp_ss_info is None:
+            self._set_mp_info(r'MultiPoint_' + self._mp_sensor_name +
+                              '*_info.bin')
+        return self._mp_ss_info
+
+    @property
+    def mp_frequencies(self):
+        """Return the multipoint sensor XFMultiPointFrequencies."""
+        if self._mp_freq is None:
+            if self._mp_frequencies_file is None:
+                self._set_data_dirs()
+            self._mp_freq = XFMultiPointFrequencies(self._mp_frequencies_file)
+        return self._mp_freq
+
+    @property
+    def mp_geometry(self):
+        """Return the multipoint sensor XFMultiPointGeometry."""
+        if self._mp_geom is None:
+            if self._mp_geom_file is None:
+                self._set_data_dirs()
+            self._load_geom()
+        return self._mp_geom
+
+    @property
+    def xf_grid(self):
+        """Return the XFGeometry of the simulation run."""
+        if self._xf_grid is None:
+            self._xf_grid = XFGeometry(self._project_dir, self._sim_id,
+                                       self._run_id)
+        return self._xf_grid
+
     @property
     def xdim(self):
         """Return the X dimension values."""
+        if self._xdim is None:
+            self._load_mp_ss_grid()
         return self._xdim
 
     @property
     def ydim(self):
         """Return the Y dimension values."""
+        if self._ydim is None:
+            self._load_mp_ss_grid()
         return self._ydim
 
     @property
     def zdim(self):
         """Return the Z dimension values."""
+        if self._zdim is None:
+            self._load_mp_ss_grid()
         return self._zdim
 
     def _ss_pdd_dir_name(self, field_type, component):
@@ -240,9 +302,20 @@ class XFFieldNonUniformGrid(object):
 
         return field_file_subdir
 
-    def ss_field_data(self, data_type, component):
-        """Return the field or dissipated power values."""
-        (path_head, path_tail) = os.path.split(self._mp_ss_info_file[0])
+    def _frequency_index(self, frequency):
+        """Return the field file index for frequency (Hz); None gives 0."""
+        if frequency is None:
+            return 0
+        return self.mp_frequencies.frequency_index(frequency)
+
+    def _ss_data_files(self, data_type, component, frequency_index=0):
+        """
+        Return the data files for data_type, component: [real, imaginary]
+        for field types, [power] for dissipated power, [] if invalid.
+        The N.bin files for N = frequency_index are returned.
+        """
+        data_file_name = r'%d.bin' % frequency_index
+        (path_head, path_tail) = os.path.split(self.mp_ss_info_file)
         path_tail = ''.join(path_tail.split('_info.bin'))
         mp_ss_dir = os.path.join(path_head, path_tail)
 
@@ -252,36 +325,197 @@ class XFFieldNonUniformGrid(object):
                                                      component, r'r')
             field_dir_imag = self._ss_field_dir_name(data_type,
                                                      component, r'i')
+            return [os.path.join(mp_ss_dir, field_dir_real, data_file_name),
+                    os.path.join(mp_ss_dir, field_dir_imag, data_file_name)]
+
+        # Dissipated power
+        elif data_type == 'P':
+            power_dir = self._ss_pdd_dir_name(data_type, component)
+            return [os.path.join(mp_ss_dir, power_dir, data_file_name)]
+
+        print(r'Invalid data_type: ', data_type)
+        return []
+
+    def ss_field_data(self, data_type, component, dtype=np.complex128,
+                      frequency=None, copy=True):
+        """
+        Return the field or dissipated power values at frequency (Hz), or at
+        the first sensor frequency if frequency is None.
 
+        Field values are returned as a complex array of the given dtype;
+        np.complex64 halves the memory of the default np.complex128.  The
+        real and imaginary parts are written in place into one array.
+        Dissipated power is returned with the matching real dtype.
 
-            file_name_real = os.path.join(mp_ss_dir, field_dir_real, r'0.bin')
-            file_name_imag = os.path.join(mp_ss_dir, field_dir_imag, r'0.bin')
+        A copy of the cached cube is returned, so callers may modify it in
+        place.  With copy=False the cached array itself is returned; it is
+        read-only and shared with later calls.
+        """
+        if not np.issubdtype(dtype, np.complexfloating):
+            raise TypeError("ss_field_data dtype must be complex: " +
+                            str(dtype))
+        frequency_index = self._frequency_index(frequency)
+        cache_key = (data_type, component, frequency_index,
+                     np.dtype(dtype).str)
+        field_data = self._field_cache.get(cache_key)
+        if field_data is not None:
+            self._ss_field_data = field_data
+            return self._ss_field_data.copy() if copy else self._ss_field_data
+
+        data_files = self._ss_data_files(data_type, component,
+                                         frequency_index)
+
+        if len(data_files) == 2:
+            (file_name_real, file_name_imag) = data_files
+            self._ss_field_data = np.empty(self.mp_geometry.cube_shape,
+                                           dtype=dtype)
             print("Loading field data from: ", file_name_real)
-            mp_ss_field_real = XFMultiPointSSField(file_name_real,
-                                                   self._mp_ss_info,
-                                                   self._mp_geom)
+            XFMultiPointSSField(file_name_real, self.mp_ss_info,
+                                self.mp_geometry, out=self._ss_field_data.real)
             print("Loading field data from: ", file_name_imag)
-            mp_ss_field_imag = XFMultiPointSSField(file_name_imag,
-                                                   self._mp_ss_info,
-                                                   self._mp_geom)
-            self._ss_field_data = mp_ss_field_real.ss_field + \
-                                  1j * mp_ss_field_imag.ss_field
+            XFMultiPointSSField(file_name_imag, self.mp_ss_info,
+                                self.mp_geometry, out=self._ss_field_data.imag)
 
-        # Dissipated power
-        elif data_type == 'P':
-            power_dir = self._ss_pdd_dir_name(data_type, component)
-            file_name = os.path.join(mp_ss_dir, power_dir, r'0.bin')
-            print("Loading dissipated power data from: ", file_name)
-            mp_ss_dissipated_power_data = XFMultiPointSSField(file_name,
-                                                              self._mp_ss_info,
-                                                              self._mp_geom)
-            self._ss_field_data = mp_ss_dissipated_power_data.ss_field
+        elif len(data_files) == 1:
+            print("Loading dissipated power data from: ", data_files[0])
+            self._ss_field_data = np.empty(self.mp_geometry.cube_shape,
+                                           dtype=np.finfo(dtype).dtype)
+            XFMultiPointSSField(data_files[0], self.mp_ss_info,
+                                self.mp_geometry, out=self._ss_field_data)
 
         else:
-            print(r'Invalid data_type: ', data_type)
+            raise ValueError("Invalid data_type: " + str(data_type))
+
+        self._ss_field_data.flags.writeable = False
+        self._field_cache.put(cache_key, self._ss_field_data)
+        return self._ss_field_data.copy() if copy else self._ss_field_data
+
+    def nearest_index(self, point):
+        """Return the field cube (i, j, k) index nearest to point [x,y,z]."""
+        if len(point) != 3:
+            raise ValueError("Sample positions must be [x,y,z]")
+        return (int(np.argmin(abs(self.xdim - point[0]))),
+                int(np.argmin(abs(self.ydim - point[1]))),
+                int(np.argmin(abs(self.zdim - point[2]))))
+
+    def ss_field_box(self, data_type, component, start, stop,
+                     dtype=np.complex128, frequency=None, fill_value=np.nan):
+        """
+        Return the field or dissipated power values over the field cube
+        index box start <= (i, j, k) < stop without loading the full cube.
 
+        Only the sensor vertices inside the box are read from the
+        memory-mapped field files; voxels the sensor does not cover are set
+        to fill_value.  A cube already in the field cache is sliced instead.
+        """
+        if not np.issubdtype(dtype, np.complexfloating):
+            raise TypeError("ss_field_box dtype must be complex: " +
+                            str(dtype))
+        start = np.asarray(start, dtype=np.int64)
+        stop = np.asarray(stop, dtype=np.int64)
+        if np.any(start < 0) or np.any(stop > self.mp_geometry.cube_shape) or \
+           np.any(stop <= start):
+            raise ValueError("Sample box outside of field cube " +
+                             str(self.mp_geometry.cube_shape))
+        box = tuple(slice(lower, upper) for (lower, upper) in zip(start, stop))
+
+        frequency_index = self._frequency_index(frequency)
+        cache_key = (data_type, component, frequency_index,
+                     np.dtype(dtype).str)
+        field_data = self._field_cache.get(cache_key)
+        if field_data is not None:
+            # the cached cube is not filled where the sensor has no vertex
+            box_data = field_data[box].copy()
+            box_data[~self.mp_geometry.valid_mask[box]] = fill_value
+            return box_data
+
+        data_files = self._ss_data_files(data_type, component,
+                                         frequency_index)
+        if len(data_files) == 0:
+            return None
+        if len(data_files) == 1:
+            dtype = np.finfo(dtype).dtype
+
+        (rows, offsets) = self.mp_geometry.vertex_rows_in_box(start, stop)
+        box_index = np.ravel_multi_index(offsets.T, tuple(stop - start))
+        num_points = self.mp_ss_info.num_points
+        box_data = np.full(tuple(stop - start), fill_value, dtype=dtype)
+        if len(data_files) == 2:
+            box_data.real.put(box_index, read_mp_field_values(
+                data_files[0], num_points)[rows])
+            box_data.imag.put(box_index, read_mp_field_values(
+                data_files[1], num_points)[rows])
+        else:
+            box_data.put(box_index, read_mp_field_values(
+                data_files[0], num_points)[rows])
+        return box_data
 
-        return self._ss_field_data
+    def ss_field_at_index(self, data_type, component, index,
+                          dtype=np.complex128, frequency=None):
+        """
+        Return the field or dissipated power value at field cube index
+        (i, j, k), reading only that vertex from the field files.
+        """
+        index = np.asarray(index, dtype=np.int64)
+        return self.ss_field_box(data_type, component, index, index + 1,
+                                 dtype, frequency)[0, 0, 0]
+
+    def ss_field_at_point(self, data_type, component, point,
+                          dtype=np.complex128, frequency=None):
+        """
+        Return the field or dissipated power value at the field cube voxel
+        nearest to point [x,y,z].
+        """
+        return self.ss_field_at_index(data_type, component,
+                                      self.nearest_index(point),
+                                      dtype, frequency)
+
+    def clear_cache(self):
+        """Release all cached field cubes."""
+        self._field_cache.clear()
+
+    def ss_field_data_sparse(self, data_type, component,
+                             dtype=np.complex128, frequency=None):
+        """
+        Return the field or dissipated power values at the sensor vertices
+        only, as an XFMultiPointSparseField.  Use its densify() method to
+        build the full cube with a chosen fill value for uncovered voxels.
+        """
+        if not np.issubdtype(dtype, np.complexfloating):
+            raise TypeError("ss_field_data_sparse dtype must be complex: " +
+                            str(dtype))
+        data_files = self._ss_data_files(data_type, component,
+                                         self._frequency_index(frequency))
+        num_points = self.mp_ss_info.num_points
+
+        if len(data_files) == 2:
+            values = np.empty(num_points, dtype=dtype)
+            values.real = read_mp_field_values(data_files[0], num_points)
+            values.imag = read_mp_field_values(data_files[1], num_points)
+        elif len(data_files) == 1:
+            values = read_mp_field_values(data_files[0], num_points).astype(
+                np.finfo(dtype).dtype)
+        else:
+            return None
+
+        return XFMultiPointSparseField(self.mp_geometry, values)
+
+    def ss_field_cube(self, data_type, component, dtype=np.complex128,
+                      max_cached=4):
+        """
+        Return a lazy (frequency, x, y, z) XFMultiPointFrequencyField over
+        every sensor frequency of data_type, component.  Only the frequency
+        slices that are indexed are read; max_cached slices are kept.
+        """
+        if not np.issubdtype(dtype, np.complexfloating):
+            raise TypeError("ss_field_cube dtype must be complex: " +
+                            str(dtype))
+        data_files = [self._ss_data_files(data_type, component, index)
+                      for index in range(len(self.mp_frequencies.frequencies))]
+        if len(data_files) == 0 or len(data_files[0]) == 0:
+            return None
+        return XFMultiPointFrequencyField(data_files, self.mp_ss_info,
+                                          self.mp_geometry, dtype, max_cached)
 
     @property
     def project_dir(self):
@@ -297,6 +531,7 @@ class XFFieldNonUniformGrid(object):
     def sim_id(self, sim_id):
         """Set the Simulation ID."""
         self._sim_id = int(sim_id)
+        self._reset()
 
     @property
     def run_id(self):
@@ -307,8 +542,16 @@ class XFFieldNonUniformGrid(object):
     def run_id(self, run_id):
         """Set the Run ID."""
         self._run_id = int(run_id)
+        self._reset()
+
+    @property
+    def frequencies(self):
+        """Return the multipoint sensor steady state frequencies."""
+        return self.mp_frequencies.frequencies
 
     @property
     def mp_field_types(self):
         """Return the multipoint field directories."""
+        if self._mp_field_types is None:
+            self._get_mp_field_types()
         return self._mp_field_types
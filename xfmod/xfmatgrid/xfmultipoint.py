@@ -7,10 +7,40 @@ from __future__ import (absolute_import, division, generators,
                         print_function, unicode_literals)
 import struct
 import numpy as np
+from xfmod.xfutils import XFLRUCache
 #import line_profiler
 
 MP_VERTEX_LEN = 12   # (X,Y,Z) = 4-byte uint * 3
 MP_FLOAT_LEN = 4      # 4-byte float
+MP_FLOAT_DTYPE = np.dtype('<f4')  # little-endian 4-byte float
+MP_VERTEX_DTYPE = np.dtype('<u4') # little-endian 4-byte uint vertex index
+# Number of vertex_rows_in_box results kept per sensor geometry
+MP_BOX_CACHE_ITEMS = 8
+
+def _unique_indices(indices, min_index):
+    """
+    Return the sorted unique values of a non-negative index array.
+    Uses a presence count over [min_index, max_index] rather than a sort.
+    """
+    offsets = indices - min_index
+    present = np.flatnonzero(np.bincount(offsets))
+    return (present + min_index).astype(indices.dtype)
+
+def read_mp_field_values(file_name, num_points, use_memmap=True):
+    """
+    Return the float32 values of a multipoint field file (e.g. 0.bin), one
+    per sensor vertex.  With use_memmap the result is a read-only mapping of
+    the file, otherwise the file is read into memory.
+    """
+    if use_memmap:
+        return np.memmap(file_name, dtype=MP_FLOAT_DTYPE, mode='r',
+                         shape=(num_points,))
+    with open(file_name, 'rb') as file_handle:
+        field_values = np.fromfile(file_handle, dtype=MP_FLOAT_DTYPE,
+                                   count=num_points)
+    if len(field_values) < num_points:
+        raise IOError("Unexpected end of field file: " + file_name)
+    return field_values
 
 class XFMultiPointInfo(object):
     """Hold  MultiPoint file info."""
@@ -54,24 +84,37 @@ class XFMultiPointInfo(object):
         file_handle.close()
 
 class XFMultiPointGeometry(object):
-    """Multi Point Geometry Info"""
-    def __init__(self, file_name, num_points):
+    """Multi Point Geometry Info
+
+    Vertices are held as an (N, 3) uint32 array.  With use_memmap (default)
+    the array is a read-only view of geom.bin rather than a copy.
+    """
+    def __init__(self, file_name, num_points, use_memmap=True):
         self._num_points = num_points
+        self._use_memmap = use_memmap
+        self._scatter_index = None
+        self._valid_mask = None
+        self._box_rows = XFLRUCache(max_items=MP_BOX_CACHE_ITEMS)
         self._load_vertices(file_name)
 
     def _load_vertices(self, file_name):
         """Load vertices from geom.bin"""
-        with open(file_name, 'rb') as file_handle:
-            chunk = file_handle.read(MP_VERTEX_LEN * self._num_points)
-            temp = struct.unpack('I'*3*self._num_points, chunk)
-            x_val = np.transpose(np.array([temp[0::3]]))
-            y_val = np.transpose(np.array([temp[1::3]]))
-            z_val = np.transpose(np.array([temp[2::3]]))
-            self._vertices = np.hstack((x_val, y_val, z_val))
-            self._x_domain = np.unique(x_val)
-            self._y_domain = np.unique(y_val)
-            self._z_domain = np.unique(z_val)
-        file_handle.close()
+        if self._use_memmap:
+            self._vertices = np.memmap(file_name, dtype=MP_VERTEX_DTYPE,
+                                       mode='r', shape=(self._num_points, 3))
+        else:
+            with open(file_name, 'rb') as file_handle:
+                self._vertices = np.fromfile(file_handle,
+                                             dtype=MP_VERTEX_DTYPE,
+                                             count=3*self._num_points)
+            if len(self._vertices) < 3*self._num_points:
+                raise IOError("Unexpected end of geometry file: " + file_name)
+            self._vertices = self._vertices.reshape((self._num_points, 3))
+
+        min_ijk = self._vertices.min(axis=0)
+        self._x_domain = _unique_indices(self._vertices[:, 0], min_ijk[0])
+        self._y_domain = _unique_indices(self._vertices[:, 1], min_ijk[1])
+        self._z_domain = _unique_indices(self._vertices[:, 2], min_ijk[2])
 
     @property
     def x_domain(self):
@@ -93,58 +136,262 @@ class XFMultiPointGeometry(object):
         """Return the vertex index array."""
         return self._vertices
 
+    @property
+    def cube_shape(self):
+        """Return the shape of the field cube spanned by the domains."""
+        return (len(self._x_domain), len(self._y_domain), len(self._z_domain))
+
+    @property
+    def scatter_index(self):
+        """
+        Return the flat (C-order) index into the field cube for each vertex.
+        Computed on first access and shared by every field of the sensor.
+        """
+        if self._scatter_index is None:
+            self._scatter_index = np.ravel_multi_index(
+                (self._vertices[:, 0] - self._x_domain[0],
+                 self._vertices[:, 1] - self._y_domain[0],
+                 self._vertices[:, 2] - self._z_domain[0]),
+                self.cube_shape)
+        return self._scatter_index
+
+    def vertex_rows_in_box(self, start, stop):
+        """
+        Return the geom.bin rows of the vertices inside the field cube index
+        box start <= (i, j, k) < stop, and the (i, j, k) offset of each of
+        those vertices from start.  Only the vertex array is scanned, one
+        axis at a time over the rows still inside the box.
+
+        Results of recent boxes are kept (read-only), so the components of
+        a field sampled at the same box share one scan.
+        """
+        start = np.asarray(start, dtype=np.int64)
+        stop = np.asarray(stop, dtype=np.int64)
+        box_key = (tuple(start.tolist()), tuple(stop.tolist()))
+        box_rows = self._box_rows.get(box_key)
+        if box_rows is not None:
+            return box_rows
+
+        origin = np.array([self._x_domain[0], self._y_domain[0],
+                           self._z_domain[0]], dtype=np.int64)
+        start = origin + start
+        stop = origin + stop
+        column = self._vertices[:, 0]
+        rows = np.flatnonzero((column >= start[0]) & (column < stop[0]))
+        for axis in (1, 2):
+            column = self._vertices[rows, axis]
+            rows = rows[(column >= start[axis]) & (column < stop[axis])]
+        offsets = self._vertices[rows].astype(np.int64) - start
+        rows.flags.writeable = False
+        offsets.flags.writeable = False
+        self._box_rows.put(box_key, (rows, offsets))
+        return rows, offsets
+
+    @property
+    def valid_mask(self):
+        """
+        Return the read-only boolean cube, True at voxels covered by a sensor
+        vertex.  It is shared by every field on this geometry.
+        """
+        if self._valid_mask is None:
+            self._valid_mask = np.zeros(self.cube_shape, dtype=bool)
+            self._valid_mask.put(self.scatter_index, True)
+            self._valid_mask.flags.writeable = False
+        return self._valid_mask
+
 class XFMultiPointFrequencies(object):
     """Extract and store steady state frequency data from frequencies.bin"""
     def __init__(self, file_name):
-        self._frequencies = []
+        self._frequencies = np.zeros(0, dtype=MP_FLOAT_DTYPE)
         self._load_frequencies(file_name)
 
     def _load_frequencies(self, file_name):
         """Load frequencies from frequencies.bin"""
-        with open(file_name, 'rb') as file_handle:
-            while True:
-                chunk = file_handle.read(MP_FLOAT_LEN)
-                if len(chunk) < MP_FLOAT_LEN:
-                    break
-                else:
-                    self._frequencies.append(struct.unpack('f', chunk)[0])
-        file_handle.close()
+        self._frequencies = np.fromfile(file_name, dtype=MP_FLOAT_DTYPE)
 
     @property
     def frequencies(self):
-        """Return list of frequencies read from frequencies.bin"""
+        """Return float32 array of frequencies read from frequencies.bin"""
         return self._frequencies
 
+    def frequency_index(self, frequency, rtol=1.0e-6):
+        """
+        Return the index of frequency in frequencies.bin, which is also the
+        number N of the N.bin field file holding that frequency.  The
+        nearest stored frequency is used if within relative tolerance rtol.
+        """
+        if len(self._frequencies) == 0:
+            raise ValueError("No steady state frequencies available.")
+        index = int(np.argmin(np.abs(self._frequencies - frequency)))
+        if abs(self._frequencies[index] - frequency) > rtol * abs(frequency):
+            raise ValueError("Frequency " + str(frequency) +
+                             " not found in multipoint sensor frequencies.")
+        return index
+
 class XFMultiPointSSField(object):
-    """Extract steady state field values from file."""
-    def __init__(self, file_name, mp_info, mp_geometry):
+    """Extract steady state field values from file.
+
+    With use_memmap (default) the field file is mapped read-only as
+    little-endian float32 and scattered into the field cube directly from
+    the mapped buffer.  Otherwise the file is read into a float32 array.
+
+    If out is given, the values are scattered into out, which must have the
+    geometry cube shape (e.g. the .real or .imag view of a complex cube),
+    instead of a newly allocated float64 cube.
+    """
+    def __init__(self, file_name, mp_info, mp_geometry, use_memmap=True,
+                 out=None):
         self._num_points = mp_info.num_points
         self._mp_geom = mp_geometry
+        self._use_memmap = use_memmap
+        self._ss_field = out
         self._load_field_data(file_name)
 
-#    @profile
     def _load_field_data(self, file_name):
         """Load field data from given binary file."""
-        with open(file_name, 'rb') as file_handle:
-            chunk = file_handle.read(MP_FLOAT_LEN * self._num_points)
-            temp_field_data = struct.unpack('f' * self._num_points,
-                                            chunk)
-        file_handle.close()
-        self._ss_field = np.empty([len(self._mp_geom.x_domain),
-                                   len(self._mp_geom.y_domain),
-                                   len(self._mp_geom.z_domain)])
-
-        min_i_domain = np.amin(self._mp_geom.x_domain)
-        min_j_domain = np.amin(self._mp_geom.y_domain)
-        min_k_domain = np.amin(self._mp_geom.z_domain)
-
-        ind_i = self._mp_geom.vertices[:, 0] - min_i_domain
-        ind_j = self._mp_geom.vertices[:, 1] - min_j_domain
-        ind_k = self._mp_geom.vertices[:, 2] - min_k_domain
-
-        self._ss_field[ind_i, ind_j, ind_k] = temp_field_data
+        field_values = read_mp_field_values(file_name, self._num_points,
+                                            self._use_memmap)
+        if self._ss_field is None:
+            self._ss_field = np.empty(self._mp_geom.cube_shape)
+        elif np.shape(self._ss_field) != self._mp_geom.cube_shape:
+            raise ValueError("Field output array must have shape " +
+                             str(self._mp_geom.cube_shape))
+        self._ss_field.put(self._mp_geom.scatter_index, field_values)
 
     @property
     def ss_field(self):
         """Return field data."""
         return self._ss_field
+
+class XFMultiPointSparseField(object):
+    """
+    Steady state field values held at the sensor vertices only.
+
+    values[n] is the field value at vertices[n].  The dense cube over the
+    sensor bounding box is built on demand by densify(); voxels not covered
+    by the sensor are False in mask.
+    """
+    def __init__(self, mp_geometry, values):
+        if len(values) != len(mp_geometry.vertices):
+            raise ValueError("Expected one field value per sensor vertex.")
+        self._mp_geom = mp_geometry
+        self._values = values
+
+    @property
+    def vertices(self):
+        """Return the vertex index array."""
+        return self._mp_geom.vertices
+
+    @property
+    def values(self):
+        """Return the field values, one per vertex."""
+        return self._values
+
+    @property
+    def shape(self):
+        """Return the shape of the dense field cube."""
+        return self._mp_geom.cube_shape
+
+    @property
+    def mask(self):
+        """Return read-only boolean cube, True at voxels with a field value."""
+        return self._mp_geom.valid_mask
+
+    def densify(self, fill_value=np.nan, dtype=None):
+        """
+        Return the dense field cube with uncovered voxels set to fill_value.
+        """
+        if dtype is None:
+            dtype = self._values.dtype
+        dense_field = np.full(self.shape, fill_value, dtype=dtype)
+        dense_field.put(self._mp_geom.scatter_index, self._values)
+        return dense_field
+
+class XFMultiPointFrequencyField(object):
+    """
+    Lazy (frequency, x, y, z) view of one steady state field component.
+
+    data_files holds, per frequency index, the [real, imaginary] field files
+    (or [power] file) of that frequency.  Indexing reads only the frequency
+    slices it touches; each slice is built from memory-mapped files and the
+    max_cached most recently used slices are kept.
+    """
+    def __init__(self, data_files, mp_info, mp_geometry, dtype=np.complex128,
+                 max_cached=4):
+        self._data_files = data_files
+        self._mp_info = mp_info
+        self._mp_geom = mp_geometry
+        if len(data_files) > 0 and len(data_files[0]) == 1:
+            self._dtype = np.finfo(dtype).dtype
+        else:
+            self._dtype = np.dtype(dtype)
+        self._slice_cache = XFLRUCache(max_cached)
+
+    @property
+    def shape(self):
+        """Return the (frequency, x, y, z) shape of the field."""
+        return (len(self._data_files),) + self._mp_geom.cube_shape
+
+    @property
+    def ndim(self):
+        """Return the number of dimensions."""
+        return 4
+
+    @property
+    def dtype(self):
+        """Return the data type of the field values."""
+        return self._dtype
+
+    def __len__(self):
+        return len(self._data_files)
+
+    def frequency_slice(self, frequency_index):
+        """Return the read-only (x, y, z) field cube at frequency_index."""
+        frequency_index = range(len(self._data_files))[frequency_index]
+        field_cube = self._slice_cache.get(frequency_index)
+        if field_cube is None:
+            field_cube = self._load_frequency_slice(frequency_index)
+            self._slice_cache.put(frequency_index, field_cube)
+        return field_cube
+
+    def _load_frequency_slice(self, frequency_index):
+        """Read the field cube for frequency_index from disk."""
+        data_files = self._data_files[frequency_index]
+        field_cube = np.empty(self._mp_geom.cube_shape, dtype=self._dtype)
+        if len(data_files) == 2:
+            XFMultiPointSSField(data_files[0], self._mp_info, self._mp_geom,
+                                out=field_cube.real)
+            XFMultiPointSSField(data_files[1], self._mp_info, self._mp_geom,
+                                out=field_cube.imag)
+        else:
+            XFMultiPointSSField(data_files[0], self._mp_info, self._mp_geom,
+                                out=field_cube)
+        field_cube.flags.writeable = False
+        return field_cube
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) == 0 or key[0] is Ellipsis:
+            frequency_key = slice(None)
+            cube_key = key
+        else:
+            frequency_key = key[0]
+            cube_key = key[1:]
+
+        if isinstance(frequency_key, (int, np.integer)):
+            return self.frequency_slice(frequency_key)[cube_key]
+
+        frequency_indices = np.arange(len(self._data_files))[frequency_key]
+        if len(frequency_indices) == 0:
+            # index a zero-strided cube for the trailing shape, reading nothing
+            empty_cube = np.broadcast_to(np.zeros((), dtype=self._dtype),
+                                         self._mp_geom.cube_shape)
+            return np.empty((0,) + empty_cube[cube_key].shape,
+                            dtype=self._dtype)
+        return np.stack([self.frequency_slice(index)[cube_key]
+                         for index in frequency_indices])
+
+    def clear(self):
+        """Drop all cached frequency slices."""
+        self._slice_cache.clear()
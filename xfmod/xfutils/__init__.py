@@ -11,7 +11,8 @@ from .xfutils import is_valid_run_id, \
     is_valid_run_id_str, \
     xf_run_id_to_str, \
     xf_sim_id_to_str, \
-    xf_run_str_to_int
+    xf_run_str_to_int, \
+    xf_is_string
 
 
 from .xfregrid import xf_regrid_3d_nearest, XFRegridError
@@ -20,4 +21,7 @@ from .xfproject import XFProjectInfo, XFProjectError
 
 from .xfsimulation import XFSimulationInfo
 
+from .xfcache import XFLRUCache, XFArrayCache, XFJsonCache, xf_cache_dir, \
+    xf_file_digest
+
 
@@ -0,0 +1,353 @@
+"""
+Cache helpers for xfmod data readers: an in-memory least-recently-used
+cache and on-disk caches of decoded arrays and parsed values.
+"""
+
+from __future__ import (absolute_import, division, generators,
+                        print_function, unicode_literals)
+
+import os
+import json
+import shutil
+import hashlib
+import time
+import tempfile
+from collections import OrderedDict
+import numpy as np
+
+# Environment variable naming the on-disk cache directory
+XF_CACHE_DIR_ENV = 'XFMOD_CACHE_DIR'
+
+def xf_cache_dir(cache_dir=None):
+    """
+    Return the on-disk cache directory: cache_dir if given, otherwise the
+    XFMOD_CACHE_DIR environment variable, otherwise None (no caching).
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get(XF_CACHE_DIR_ENV) or None
+    return cache_dir
+
+def xf_file_digest(file_name, block_size=1 << 24):
+    """Return the SHA-1 hex digest of the contents of file_name."""
+    digest = hashlib.sha1()
+    with open(file_name, 'rb') as file_handle:
+        block = file_handle.read(block_size)
+        while block:
+            digest.update(block)
+            block = file_handle.read(block_size)
+    return digest.hexdigest()
+
+def _replace_file(source, target):
+    """
+    Rename source to target, replacing target if it exists.  Atomic where
+    os.replace (Python 3) or a POSIX rename is available.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(source, target)
+    elif os.name == 'nt' and os.path.exists(target):
+        # Python 2 on Windows cannot rename over an existing file
+        os.remove(target)
+        os.rename(source, target)
+    else:
+        os.rename(source, target)
+
+def _remove_entry(path):
+    """Remove a cache entry directory or file."""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def _value_nbytes(value):
+    """Return the memory held by value (numpy arrays), 0 if unknown."""
+    return getattr(value, 'nbytes', 0)
+
+class XFLRUCache(object):
+    """
+    Mapping that keeps at most max_items entries and at most max_bytes of
+    array data, evicting the least recently used entries first.  A limit
+    of None is unbounded.  A value larger than max_bytes is not kept.
+    """
+    def __init__(self, max_items=None, max_bytes=None):
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._nbytes = 0
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the cached value for key and mark it most recently used."""
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            return default
+        self._entries[key] = value
+        return value
+
+    def put(self, key, value):
+        """Insert value for key, evicting old entries as needed."""
+        self.pop(key)
+        self._entries[key] = value
+        self._nbytes += _value_nbytes(value)
+        self._evict()
+
+    def pop(self, key, default=None):
+        """Remove key and return its value, or default if not cached."""
+        if key not in self._entries:
+            return default
+        value = self._entries.pop(key)
+        self._nbytes -= _value_nbytes(value)
+        return value
+
+    def _over_limit(self):
+        """Return True if the cache exceeds its item or byte limit."""
+        if self._max_items is not None and \
+           len(self._entries) > self._max_items:
+            return True
+        return self._max_bytes is not None and self._nbytes > self._max_bytes
+
+    def _evict(self):
+        """Remove least recently used entries until within the limits."""
+        while self._entries and self._over_limit():
+            value = self._entries.popitem(last=False)[1]
+            self._nbytes -= _value_nbytes(value)
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+        self._nbytes = 0
+
+    @property
+    def max_items(self):
+        """Return the maximum number of entries."""
+        return self._max_items
+
+    @property
+    def max_bytes(self):
+        """Return the maximum number of bytes held."""
+        return self._max_bytes
+
+    @property
+    def nbytes(self):
+        """Return the number of bytes currently held."""
+        return self._nbytes
+
+class XFArrayCache(object):
+    """
+    On-disk cache of named arrays decoded from a source file.
+
+    Entries live in cache_dir/<kind>-<digest>/ as one .npy file per array,
+    where digest is the SHA-1 of the source file contents, and are loaded
+    memory-mapped.  A manifest records each source file's size, mtime and
+    digest so an unchanged file is not hashed again.
+
+    When a source file changes, the entries of its old contents are removed
+    unless another file in the manifest still has those contents.  prune
+    bounds the cache by age and size, and clear empties it.
+    """
+    def __init__(self, cache_dir, kind):
+        self._cache_dir = cache_dir
+        self._kind = kind
+        self._manifest_file = os.path.join(cache_dir, kind + '-manifest.json')
+
+    @property
+    def cache_dir(self):
+        """Return the cache directory."""
+        return self._cache_dir
+
+    def _load_manifest(self):
+        """Return the manifest, empty if missing or unreadable."""
+        try:
+            with open(self._manifest_file, 'r') as file_handle:
+                return json.load(file_handle)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _make_cache_dir(self):
+        """Create the cache directory if needed."""
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    def _save_manifest(self, manifest):
+        """Atomically replace the manifest."""
+        self._make_cache_dir()
+        (file_descriptor, temp_file) = tempfile.mkstemp(dir=self._cache_dir)
+        with os.fdopen(file_descriptor, 'w') as file_handle:
+            json.dump(manifest, file_handle)
+        _replace_file(temp_file, self._manifest_file)
+
+    def source_key(self, file_name):
+        """
+        Return the cache key of file_name: its content digest, reused from
+        the manifest while the file size and mtime are unchanged.
+        """
+        file_name = os.path.realpath(file_name)
+        file_stat = os.stat(file_name)
+        manifest = self._load_manifest()
+        entry = manifest.get(file_name)
+        if entry is not None and entry['size'] == file_stat.st_size and \
+           entry['mtime'] == file_stat.st_mtime:
+            return entry['digest']
+
+        digest = xf_file_digest(file_name)
+        manifest[file_name] = {'size': file_stat.st_size,
+                               'mtime': file_stat.st_mtime,
+                               'digest': digest}
+        self._save_manifest(manifest)
+        # entries of the replaced contents are no longer reachable
+        if entry is not None and entry['digest'] != digest and \
+           entry['digest'] not in self._manifest_digests(manifest):
+            for (entry_path, _, _) in self._entries(entry['digest']):
+                _remove_entry(entry_path)
+        return digest
+
+    @staticmethod
+    def _manifest_digests(manifest):
+        """Return the set of digests listed in manifest."""
+        return set(entry['digest'] for entry in manifest.values())
+
+    def _entries(self, key=None):
+        """
+        Return (path, size in bytes, mtime) of the entries of this kind, of
+        key only if given (mesh sections share the key of their file).
+        """
+        prefix = self._kind + '-'
+        if key is not None:
+            prefix += key
+        entries = []
+        if not os.path.isdir(self._cache_dir):
+            return entries
+        for name in os.listdir(self._cache_dir):
+            path = os.path.join(self._cache_dir, name)
+            if not name.startswith(prefix) or path == self._manifest_file:
+                continue
+            if os.path.isdir(path):
+                size = sum(os.path.getsize(os.path.join(path, file_name))
+                           for file_name in os.listdir(path))
+            else:
+                size = os.path.getsize(path)
+            entries.append((path, size, os.path.getmtime(path)))
+        return entries
+
+    def prune(self, max_bytes=None, max_age=None):
+        """
+        Remove stale entries: those of source files that are gone or have
+        changed, those not used for max_age seconds, then the least recently
+        used until the entries take at most max_bytes.
+        """
+        manifest = self._load_manifest()
+        for (file_name, entry) in list(manifest.items()):
+            try:
+                file_stat = os.stat(file_name)
+            except OSError:
+                del manifest[file_name]
+                continue
+            if entry['size'] != file_stat.st_size or \
+               entry['mtime'] != file_stat.st_mtime:
+                del manifest[file_name]
+        if os.path.isdir(self._cache_dir):
+            self._save_manifest(manifest)
+        digests = self._manifest_digests(manifest)
+
+        now = time.time()
+        entries = []
+        for (path, size, mtime) in self._entries():
+            key = os.path.basename(path)[len(self._kind) + 1:]
+            if not any(key.startswith(digest) for digest in digests) or \
+               (max_age is not None and now - mtime > max_age):
+                _remove_entry(path)
+            else:
+                entries.append((mtime, size, path))
+        if max_bytes is not None:
+            total = sum(size for (_, size, _) in entries)
+            for (_, size, path) in sorted(entries):
+                if total <= max_bytes:
+                    break
+                _remove_entry(path)
+                total -= size
+
+    def clear(self):
+        """Remove all entries of this kind and the manifest."""
+        for (path, _, _) in self._entries():
+            _remove_entry(path)
+        if os.path.exists(self._manifest_file):
+            os.remove(self._manifest_file)
+
+    def _entry_dir(self, key):
+        """Return the directory of the entry for key."""
+        return os.path.join(self._cache_dir, self._kind + '-' + key)
+
+    def load(self, key):
+        """
+        Return a dict of the arrays stored for key, memory-mapped
+        read-only, or None if there is no entry.
+        """
+        entry_dir = self._entry_dir(key)
+        if not os.path.isdir(entry_dir):
+            return None
+        # mark the entry as recently used for prune
+        os.utime(entry_dir, None)
+        arrays = dict()
+        for file_name in os.listdir(entry_dir):
+            if file_name.endswith('.npy'):
+                arrays[file_name[:-4]] = np.load(os.path.join(entry_dir,
+                                                              file_name),
+                                                 mmap_mode='r',
+                                                 allow_pickle=False)
+        return arrays
+
+    def save(self, key, arrays):
+        """
+        Store the dict of arrays for key.  The entry is written to a
+        temporary directory and renamed into place, so readers never see a
+        partial entry.
+        """
+        self._make_cache_dir()
+        temp_dir = tempfile.mkdtemp(dir=self._cache_dir)
+        try:
+            for (name, array) in arrays.items():
+                np.save(os.path.join(temp_dir, name + '.npy'), array)
+            os.rename(temp_dir, self._entry_dir(key))
+        except OSError:
+            # another process stored the same entry first
+            if not os.path.isdir(self._entry_dir(key)):
+                raise
+        finally:
+            if os.path.isdir(temp_dir):
+                shutil.rmtree(temp_dir)
+
+class XFJsonCache(XFArrayCache):
+    """
+    On-disk cache of parsed values (dicts, lists, strings and numbers),
+    stored as one JSON document per source file in
+    cache_dir/<kind>-<digest>.json.  Keys come from source_key, as for
+    XFArrayCache.  Loading an entry never runs code, so the cache
+    directory may be shared.
+    """
+    def _entry_file(self, key):
+        """Return the JSON file of the entry for key."""
+        return self._entry_dir(key) + '.json'
+
+    def load(self, key):
+        """Return the value stored for key, or None if there is none."""
+        try:
+            with open(self._entry_file(key), 'r') as file_handle:
+                value = json.load(file_handle)
+            # mark the entry as recently used for prune
+            os.utime(self._entry_file(key), None)
+            return value
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, key, value):
+        """Store value for key, atomically replacing any old entry."""
+        self._make_cache_dir()
+        (file_descriptor, temp_file) = tempfile.mkstemp(dir=self._cache_dir)
+        with os.fdopen(file_descriptor, 'w') as file_handle:
+            json.dump(value, file_handle)
+        _replace_file(temp_file, self._entry_file(key))
@@ -12,6 +12,15 @@ MAX_RUN_ID = 9999    # Maximum valid RunID
 MIN_SIM_ID = 1       # Minimum valid Simulation ID
 MAX_SIM_ID = 999999  # Maximum valid Simulation ID
 
+try:
+    STRING_TYPES = basestring  # Python 2: str and unicode
+except NameError:
+    STRING_TYPES = str
+
+def xf_is_string(value):
+    """Check whether value is a str, or a str or unicode under Python 2."""
+    return isinstance(value, STRING_TYPES)
+
 def is_valid_run_id(run_id):
     """Check whether run_id is valid XFdtd run id."""
     if isinstance(run_id, int):
@@ -13,11 +13,17 @@ from xfmod.xfwriter import XFMatWriterUniform, XFGridDataWriterUniform
 from xfmod.xfwriter.vopgen.sarmask import VopgenSarMask
 
 class VopgenPropertyMap(XFMatWriterUniform):
-    """Matlab writer for 4-D conductivity and mass density maps."""
-    def __init__(self, xf_project_dir, sim_id, run_id):
+    """
+    Matlab writer for 4-D conductivity and mass density maps.
+
+    cache_dir (or the XFMOD_CACHE_DIR environment variable) is the on-disk
+    cache of parsed geometry and decoded mesh, see XFMesh.
+    """
+    def __init__(self, xf_project_dir, sim_id, run_id, cache_dir=None):
         self._xf_project_dir = xf_project_dir
         self._sim_id = sim_id
         self._run_id = run_id
+        self._cache_dir = cache_dir
         self._xdim_uniform = None
         self._ydim_uniform = None
         self._zdim_uniform = None
@@ -32,21 +38,48 @@ class VopgenPropertyMap(XFMatWriterUniform):
         self._zlen = 0.0
         self._mass_density_map = None
         self._conductivity_map = None
-        geom = XFGeometry(xf_project_dir, sim_id, run_id)
-        mesh = XFMesh(xf_project_dir, sim_id, run_id)
-        self._grid_exporter = XFGridExporter(geom, mesh)
+        self._mat_ids_uniform = None
+        self._mat_ids_grid = None
+        geom = XFGeometry(xf_project_dir, sim_id, run_id, cache_dir)
+        mesh = XFMesh(xf_project_dir, sim_id, run_id, cache_dir)
+        self._grid_exporter = XFGridExporter(geom, mesh,
+                                             ('ex', 'ey', 'ez'))
         self._mask = None
         
     def _make_mask(self):
         """Create mask to return only tissue values."""
         vopgen_sar_mask = VopgenSarMask(self._xf_project_dir,
-                                        self._sim_id, self._run_id)
+                                        self._sim_id, self._run_id,
+                                        self._cache_dir)
         vopgen_sar_mask.set_grid_origin(self._x0, self._y0, self._z0)
         vopgen_sar_mask.set_grid_len(self._xlen, self._ylen, self._zlen)
         vopgen_sar_mask.set_grid_resolution(self._dx, self._dy, self._dz)
         self._mask = vopgen_sar_mask.make_sar_mask()
         
         
+    def _regrid_mat_ids(self):
+        """
+        Return the Ex, Ey, Ez material ID volumes resampled on the uniform
+        grid.  They are regridded once per export grid and shared by all
+        property maps.
+        """
+        export_grid = (self._xdim_uniform, self._ydim_uniform,
+                       self._zdim_uniform)
+        if self._mat_ids_uniform is None or \
+                not all(np.array_equal(dim, cached_dim) for (dim, cached_dim)
+                        in zip(export_grid, self._mat_ids_grid)):
+            self._mat_ids_grid = export_grid
+            self._mat_ids_uniform = [
+                regrid3d((self._grid_exporter.grid_x,
+                          self._grid_exporter.grid_y,
+                          self._grid_exporter.grid_z),
+                         (self._xdim_uniform,
+                          self._ydim_uniform,
+                          self._zdim_uniform),
+                         self._grid_exporter.mat_ids(direction))
+                for direction in ('ex', 'ey', 'ez')]
+        return self._mat_ids_uniform
+
     def make_mass_density_map(self):
         """
         Construct the mass density map with dimensions [xdim, ydim, zdim, 3]
@@ -59,33 +92,18 @@ class VopgenPropertyMap(XFMatWriterUniform):
 
         # Mass density components on Ex grid locations,
         # resampled on uniform grid
-        self._mass_density_map[:,:,:,0] = regrid3d((self._grid_exporter.grid_x,
-                                                    self._grid_exporter.grid_y,
-                                                    self._grid_exporter.grid_z),
-                                                   (self._xdim_uniform,
-                                                    self._ydim_uniform,
-                                                    self._zdim_uniform),
-                                                   self._grid_exporter.ex_density)
+        self._mass_density_map[:,:,:,0] = self._grid_exporter.mesh_property(
+            'ex', 'density', self._regrid_mat_ids()[0])
         
         # Mass density components on Ey grid locations,
         # resampled on uniform grid
-        self._mass_density_map[:,:,:,1] = regrid3d((self._grid_exporter.grid_x,
-                                                    self._grid_exporter.grid_y,
-                                                    self._grid_exporter.grid_z),
-                                                   (self._xdim_uniform,
-                                                    self._ydim_uniform,
-                                                    self._zdim_uniform),
-                                                   self._grid_exporter.ey_density)
+        self._mass_density_map[:,:,:,1] = self._grid_exporter.mesh_property(
+            'ey', 'density', self._regrid_mat_ids()[1])
 
         # Mass density components on Ez grid locations,
         # resampled on uniform grid
-        self._mass_density_map[:,:,:,2] = regrid3d((self._grid_exporter.grid_x,
-                                                    self._grid_exporter.grid_y,
-                                                    self._grid_exporter.grid_z),
-                                                   (self._xdim_uniform,
-                                                    self._ydim_uniform,
-                                                    self._zdim_uniform),
-                                                   self._grid_exporter.ez_density)
+        self._mass_density_map[:,:,:,2] = self._grid_exporter.mesh_property(
+            'ez', 'density', self._regrid_mat_ids()[2])
 
         # apply mask
         if self._mask is None:
@@ -110,33 +128,18 @@ class VopgenPropertyMap(XFMatWriterUniform):
 
         # Conductivity component on Ex grid locations,
         # resampled on uniform grid
-        self._conductivity_map[:,:,:,0] = regrid3d((self._grid_exporter.grid_x,
-                                                    self._grid_exporter.grid_y,
-                                                    self._grid_exporter.grid_z),
-                                                   (self._xdim_uniform,
-                                                    self._ydim_uniform,
-                                                    self._zdim_uniform),
-                                                   self._grid_exporter.ex_sigma)
+        self._conductivity_map[:,:,:,0] = self._grid_exporter.mesh_property(
+            'ex', 'sigma', self._regrid_mat_ids()[0])
 
         # Conductivity component on Ex grid locations,
         # resampled on uniform grid
-        self._conductivity_map[:,:,:,1] = regrid3d((self._grid_exporter.grid_x,
-                                                    self._grid_exporter.grid_y,
-                                                    self._grid_exporter.grid_z),
-                                                   (self._xdim_uniform,
-                                                    self._ydim_uniform,
-                                                    self._zdim_uniform),
-                                                   self._grid_exporter.ey_sigma)
+        self._conductivity_map[:,:,:,1] = self._grid_exporter.mesh_property(
+            'ey', 'sigma', self._regrid_mat_ids()[1])
         
         # Conductivity component on Ex grid locations,
         # resampled on uniform grid
-        self._conductivity_map[:,:,:,2] = regrid3d((self._grid_exporter.grid_x,
-                                                    self._grid_exporter.grid_y,
-                                                    self._grid_exporter.grid_z),
-                                                   (self._xdim_uniform,
-                                                    self._ydim_uniform,
-                                                    self._zdim_uniform),
-                                                   self._grid_exporter.ez_sigma)
+        self._conductivity_map[:,:,:,2] = self._grid_exporter.mesh_property(
+            'ez', 'sigma', self._regrid_mat_ids()[2])
         if self._mask is None:
             self._make_mask()
         self._conductivity_map[:,:,:,0] = np.multiply(self._conductivity_map[:,:,:,0], self._mask)
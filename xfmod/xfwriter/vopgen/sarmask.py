@@ -17,8 +17,13 @@ from xfmod.xfwriter.vopgen.removeNaNs import removeNaNs
 #TISSUE_THRESHOLD = 0.2  
 
 class VopgenSarMask(XFMatWriterUniform):
-    """Matlab writer for 3-D SAR bitmap mask."""
-    def __init__(self, xf_project_dir, sim_id, run_id):
+    """
+    Matlab writer for 3-D SAR bitmap mask.
+
+    cache_dir (or the XFMOD_CACHE_DIR environment variable) is the on-disk
+    cache of parsed geometry and decoded mesh, see XFMesh.
+    """
+    def __init__(self, xf_project_dir, sim_id, run_id, cache_dir=None):
         self._xdim_uniform = None
         self._ydim_uniform = None
         self._zdim_uniform = None
@@ -33,10 +38,22 @@ class VopgenSarMask(XFMatWriterUniform):
         self._z0 = 0.0
         self._sar_mask = None
         self._tissue_mask = None
-        geom = XFGeometry(xf_project_dir, sim_id, run_id)
-        mesh = XFMesh(xf_project_dir, sim_id, run_id)
-        self._grid_exporter = XFGridExporter(geom, mesh)
+        geom = XFGeometry(xf_project_dir, sim_id, run_id, cache_dir)
+        mesh = XFMesh(xf_project_dir, sim_id, run_id, cache_dir)
+        self._grid_exporter = XFGridExporter(geom, mesh,
+                                             ('ex', 'ey', 'ez'))
         
+    def _regrid_mat_ids(self):
+        """Return the Ex, Ey, Ez material ID volumes on the uniform grid."""
+        return [xf_regrid_3d_nearest((self._grid_exporter.grid_x,
+                                      self._grid_exporter.grid_y,
+                                      self._grid_exporter.grid_z),
+                                     (self._xdim_uniform,
+                                      self._ydim_uniform,
+                                      self._zdim_uniform),
+                                     self._grid_exporter.mat_ids(direction))
+                for direction in ('ex', 'ey', 'ez')]
+
     def make_tissue_mask(self):
         """Construct a mask from tissue properties on uniformly spaced grid."""
         self._update_export_grid()
@@ -44,31 +61,14 @@ class VopgenSarMask(XFMatWriterUniform):
                                       len(self._ydim_uniform),
                                       len(self._zdim_uniform)),
                                      dtype = np.dtype(int))
-        tissue_mask_ex = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                               self._grid_exporter.grid_y,
-                                               self._grid_exporter.grid_z),
-                                              (self._xdim_uniform,
-                                               self._ydim_uniform,
-                                               self._zdim_uniform),
-                                              self._grid_exporter.ex_tissue)
-        tissue_mask_ey = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                               self._grid_exporter.grid_y,
-                                               self._grid_exporter.grid_z),
-                                              (self._xdim_uniform,
-                                               self._ydim_uniform,
-                                               self._zdim_uniform),
-                                              self._grid_exporter.ey_tissue)
-        tissue_mask_ez = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                               self._grid_exporter.grid_y,
-                                               self._grid_exporter.grid_z),
-                                              (self._xdim_uniform,
-                                               self._ydim_uniform,
-                                               self._zdim_uniform),
-                                           self._grid_exporter.ez_tissue)
+        (tissue_mask_ex, tissue_mask_ey, tissue_mask_ez) = [
+            self._grid_exporter.mesh_property(direction, 'tissue', mat_ids)
+            for (direction, mat_ids) in zip(('ex', 'ey', 'ez'),
+                                            self._regrid_mat_ids())]
         self._tissue_mask = np.zeros((len(self._xdim_uniform),
                                       len(self._ydim_uniform),
                                       len(self._zdim_uniform)),
-                                     dtype = np.int )
+                                     dtype = int)
         self._tissue_mask[np.where((tissue_mask_ex + tissue_mask_ey + tissue_mask_ez) > 0.0)] = 1
         
         return self._tissue_mask
@@ -77,51 +77,16 @@ class VopgenSarMask(XFMatWriterUniform):
         """Construct a SAR mask using the vopgen method."""
         self._update_export_grid()
 
-        # Material Conducivity on resampled Ex, Ey, Ez grid
-        sigma_ex_uniform = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                 self._grid_exporter.grid_y,
-                                                 self._grid_exporter.grid_z),
-                                                (self._xdim_uniform,
-                                                 self._ydim_uniform,
-                                                 self._zdim_uniform),
-                                                self._grid_exporter.ex_sigma)
-        sigma_ey_uniform = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                 self._grid_exporter.grid_y,
-                                                 self._grid_exporter.grid_z),
-                                                (self._xdim_uniform,
-                                                 self._ydim_uniform,
-                                                 self._zdim_uniform),
-                                                self._grid_exporter.ey_sigma)
-        sigma_ez_uniform = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                 self._grid_exporter.grid_y,
-                                                 self._grid_exporter.grid_z),
-                                                (self._xdim_uniform,
-                                                 self._ydim_uniform,
-                                                 self._zdim_uniform),
-                                                self._grid_exporter.ez_sigma)
-
-        # Material Density on resampled Ex, Ey, Ez grid
-        density_ex_uniform = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                   self._grid_exporter.grid_y,
-                                                   self._grid_exporter.grid_z),
-                                                  (self._xdim_uniform,
-                                                   self._ydim_uniform,
-                                                   self._zdim_uniform),
-                                                  self._grid_exporter.ex_density)
-        density_ey_uniform = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                   self._grid_exporter.grid_y,
-                                                   self._grid_exporter.grid_z),
-                                                  (self._xdim_uniform,
-                                                   self._ydim_uniform,
-                                                   self._zdim_uniform),
-                                                  self._grid_exporter.ey_density)
-        density_ez_uniform = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                   self._grid_exporter.grid_y,
-                                                   self._grid_exporter.grid_z),
-                                                  (self._xdim_uniform,
-                                                   self._ydim_uniform,
-                                                   self._zdim_uniform),
-                                                  self._grid_exporter.ez_density)
+        # Material Conductivity and Density on resampled Ex, Ey, Ez grid
+        mat_ids_uniform = self._regrid_mat_ids()
+        (sigma_ex_uniform, sigma_ey_uniform, sigma_ez_uniform) = [
+            self._grid_exporter.mesh_property(direction, 'sigma', mat_ids)
+            for (direction, mat_ids) in zip(('ex', 'ey', 'ez'),
+                                            mat_ids_uniform)]
+        (density_ex_uniform, density_ey_uniform, density_ez_uniform) = [
+            self._grid_exporter.mesh_property(direction, 'density', mat_ids)
+            for (direction, mat_ids) in zip(('ex', 'ey', 'ez'),
+                                            mat_ids_uniform)]
         cod_x = np.greater(removeNaNs(0.5 * np.divide(sigma_ex_uniform, density_ex_uniform)), 0.0)
         
         cod_y = np.greater(removeNaNs(0.5 * np.divide(sigma_ey_uniform, density_ey_uniform)), 0.0)
@@ -59,28 +59,30 @@ class XFFieldWriter(XFMatWriter):
         if len(b1_point) != 3:
             raise XFFieldError("Scaling positions must be [x,y,z]")
 
-        x_ind = np.argmin(abs(self._field_nonuniform_grid.xdim - b1_point[0]))
+        (x_ind, y_ind, z_ind) = \
+            self._field_nonuniform_grid.nearest_index(b1_point)
         if (x_ind == 0) or \
            (x_ind == (len(self._field_nonuniform_grid.xdim) - 1)):
             raise XFFieldError("Scaling by B1 outside of computational domain.")
-        y_ind = np.argmin(abs(self._field_nonuniform_grid.ydim - b1_point[1]))
         if (y_ind == 0) or \
            (y_ind == (len(self._field_nonuniform_grid.ydim) - 1)):
             raise XFFieldError("Scaling by B1 outside of computational domain.")
-        z_ind = np.argmin(abs(self._field_nonuniform_grid.zdim - b1_point[2]))
         if (z_ind == 0) or \
            (z_ind == (len(self._field_nonuniform_grid.zdim) - 1)):
             raise XFFieldError("Scaling by B1 outside of computational domain.")
 
-        b1x = self._field_nonuniform_grid.ss_field_data('B', 'x')[x_ind,
-                                                                  y_ind,
-                                                                  z_ind]
-        b1y = self._field_nonuniform_grid.ss_field_data('B', 'y')[x_ind,
-                                                                  y_ind,
-                                                                  z_ind]
-        b1z = self._field_nonuniform_grid.ss_field_data('B', 'z')[x_ind,
-                                                                  y_ind,
-                                                                  z_ind]
+        b1x = self._field_nonuniform_grid.ss_field_at_index('B', 'x',
+                                                            (x_ind, y_ind,
+                                                             z_ind))
+        b1y = self._field_nonuniform_grid.ss_field_at_index('B', 'y',
+                                                            (x_ind, y_ind,
+                                                             z_ind))
+        b1z = self._field_nonuniform_grid.ss_field_at_index('B', 'z',
+                                                            (x_ind, y_ind,
+                                                             z_ind))
+        if np.isnan(b1x) or np.isnan(b1y) or np.isnan(b1z):
+            raise XFFieldError("No B1 field at scaling position: the " +
+                               "nearest voxel is not covered by the sensor.")
         self._field_norm = b1_mag/sqrt(abs(b1x*b1x.conjugate()) +
                                        abs(b1y*b1y.conjugate()) +
                                        abs(b1z*b1z.conjugate()))
@@ -115,9 +117,9 @@ class XFFieldWriter(XFMatWriter):
         self._xdim = self._field_nonuniform_grid.xdim
         self._ydim = self._field_nonuniform_grid.ydim
         self._zdim = self._field_nonuniform_grid.zdim
-        self._fx_original = self._field_nonuniform_grid.ss_field_data(field_type, 'x')
-        self._fy_original = self._field_nonuniform_grid.ss_field_data(field_type, 'y')
-        self._fz_original = self._field_nonuniform_grid.ss_field_data(field_type, 'z')
+        self._fx_original = self._field_nonuniform_grid.ss_field_data(field_type, 'x', copy=False)
+        self._fy_original = self._field_nonuniform_grid.ss_field_data(field_type, 'y', copy=False)
+        self._fz_original = self._field_nonuniform_grid.ss_field_data(field_type, 'z', copy=False)
         self._scale_fields()
 
 class XFFieldWriterNonUniform(XFFieldWriter):
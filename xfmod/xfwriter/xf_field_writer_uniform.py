@@ -89,21 +89,21 @@ class XFFieldWriterUniform(XFFieldWriter):
                                         (self._xdim,
                                          self._ydim,
                                          self._zdim),
-                                        self._field_nonuniform_grid.ss_field_data(field_type, 'x')) * self._field_norm
+                                        self._field_nonuniform_grid.ss_field_data(field_type, 'x', copy=False)) * self._field_norm
         self._fy = xf_regrid_3d_nearest((self._field_nonuniform_grid.xdim,
                                          self._field_nonuniform_grid.ydim,
                                          self._field_nonuniform_grid.zdim),
                                         (self._xdim,
                                          self._ydim,
                                          self._zdim),
-                                        self._field_nonuniform_grid.ss_field_data(field_type, 'y')) * self._field_norm
+                                        self._field_nonuniform_grid.ss_field_data(field_type, 'y', copy=False)) * self._field_norm
         self._fz = xf_regrid_3d_nearest((self._field_nonuniform_grid.xdim,
                                          self._field_nonuniform_grid.ydim,
                                          self._field_nonuniform_grid.zdim),
                                         (self._xdim,
                                          self._ydim,
                                          self._zdim),
-                                        self._field_nonuniform_grid.ss_field_data(field_type, 'z')) * self._field_norm
+                                        self._field_nonuniform_grid.ss_field_data(field_type, 'z', copy=False)) * self._field_norm
 
         return self._fx, self._fy, self._fz
 
@@ -113,9 +113,9 @@ class XFFieldWriterUniform(XFFieldWriter):
         self._xdim = self._field_nonuniform_grid.xdim
         self._ydim = self._field_nonuniform_grid.ydim
         self._zdim = self._field_nonuniform_grid.zdim
-        self._fx_original = self._field_nonuniform_grid.ss_field_data(field_type, 'x')
-        self._fy_original = self._field_nonuniform_grid.ss_field_data(field_type, 'y')
-        self._fz_original = self._field_nonuniform_grid.ss_field_data(field_type, 'z')
+        self._fx_original = self._field_nonuniform_grid.ss_field_data(field_type, 'x', copy=False)
+        self._fy_original = self._field_nonuniform_grid.ss_field_data(field_type, 'y', copy=False)
+        self._fz_original = self._field_nonuniform_grid.ss_field_data(field_type, 'z', copy=False)
 
 
     def savemat(self, field_type, file_name):
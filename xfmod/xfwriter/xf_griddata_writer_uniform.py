@@ -11,13 +11,24 @@ import ast
 import getopt
 import numpy as np
 import scipy.io as spio
-import xfmod.xfgeomod
+from xfmod import xfgeomod
 from xfmod.xfwriter import XFMatWriterUniform
 from xfmod.xfutils import xf_regrid_3d_nearest
+from xfmod.xfgeomod.xfgridexporter import MESH_PROPERTY_KEYS
 
 class XFGridDataWriterUniform(XFMatWriterUniform):
-    """Write XFdtd grid data to mat file on uniform grid."""
-    def __init__(self, xf_project_dir, sim_id, run_id):
+    """
+    Write XFdtd grid data to mat file on uniform grid.
+
+    directions ('ex' ... 'hz') and properties ('density', 'sigma',
+    'epsilon_r', 'tissue') select the mesh data written, by default density,
+    sigma and epsilon_r on the Ex, Ey and Ez edges.  H edges only carry
+    density and tissue.  cache_dir (or the XFMOD_CACHE_DIR environment
+    variable) is the on-disk cache of parsed geometry and decoded mesh, see
+    XFMesh.
+    """
+    def __init__(self, xf_project_dir, sim_id, run_id, directions=None,
+                 properties=None, cache_dir=None):
         self._x0 = 0.0
         self._y0 = 0.0
         self._z0 = 0.0
@@ -30,27 +41,15 @@ class XFGridDataWriterUniform(XFMatWriterUniform):
         self._xdim = None
         self._ydim = None
         self._zdim = None
-        self._ex_sigma = None
-        self._ey_sigma = None
-        self._ez_sigma = None
-        self._hx_sigma = None
-        self._hy_sigma = None
-        self._hz_sigma = None
-        self._ex_density = None
-        self._ey_density = None
-        self._ez_density = None
-        self._hx_density = None
-        self._hy_density = None
-        self._hz_density = None
-        self._ex_epsilon_r = None
-        self._ey_epsilon_r = None
-        self._ez_epsilon_r = None
-        self._hx_epsilon_r = None
-        self._hy_epsilon_r = None
-        self._hz_epsilon_r = None
-        self._geom = xfgeomod.XFGeometry(xf_project_dir, sim_id, run_id)
-        self._mesh = xfgeomod.XFMesh(xf_project_dir, sim_id, run_id)
-        self._grid_exporter = xfgeomod.XFGridExporter(self._geom, self._mesh)
+        # regridded mesh data by mat file name ('MeshExDensity' ...)
+        self._mesh_data = None
+        self._properties = properties
+        self._geom = xfgeomod.XFGeometry(xf_project_dir, sim_id, run_id,
+                                         cache_dir)
+        self._mesh = xfgeomod.XFMesh(xf_project_dir, sim_id, run_id,
+                                     cache_dir)
+        self._grid_exporter = xfgeomod.XFGridExporter(self._geom, self._mesh,
+                                                      directions)
 
     def _regrid(self):
         """Regrid the mesh and grid data."""
@@ -71,134 +70,32 @@ class XFGridDataWriterUniform(XFMatWriterUniform):
         print("_regrid: _ydim: ", np.shape(self._ydim))
         print("_regrid: _zdim: ", np.shape(self._zdim))
         print("Interpolating data.")
-        self._ex_sigma = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                               self._grid_exporter.grid_y,
-                                               self._grid_exporter.grid_z),
-                                              (self._xdim,
-                                               self._ydim,
-                                               self._zdim),
-                                              self._grid_exporter.ex_sigma)
-        self._ey_sigma = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                               self._grid_exporter.grid_y,
-                                               self._grid_exporter.grid_z),
-                                              (self._xdim,
-                                               self._ydim,
-                                               self._zdim),
-                                              self._grid_exporter.ey_sigma)
-        self._ez_sigma = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                               self._grid_exporter.grid_y,
-                                               self._grid_exporter.grid_z),
-                                              (self._xdim,
-                                               self._ydim,
-                                               self._zdim),
-                                              self._grid_exporter.ez_sigma)
-        self._ex_epsilon_r = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                   self._grid_exporter.grid_y,
-                                                   self._grid_exporter.grid_z),
-                                                  (self._xdim,
-                                                   self._ydim,
-                                                   self._zdim),
-                                                  self._grid_exporter.ex_epsilon_r)
-        self._ey_epsilon_r = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                   self._grid_exporter.grid_y,
-                                                   self._grid_exporter.grid_z),
-                                                  (self._xdim,
-                                                   self._ydim,
-                                                   self._zdim),
-                                                  self._grid_exporter.ey_epsilon_r)
-        self._ez_epsilon_r = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                   self._grid_exporter.grid_y,
-                                                   self._grid_exporter.grid_z),
-                                                  (self._xdim,
-                                                   self._ydim,
-                                                   self._zdim),
-                                                  self._grid_exporter.ez_epsilon_r)
-        self._ex_density = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                 self._grid_exporter.grid_y,
-                                                 self._grid_exporter.grid_z),
-                                                (self._xdim,
-                                                 self._ydim,
-                                                 self._zdim),
-                                                self._grid_exporter.ex_density)
-        self._ey_density = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                 self._grid_exporter.grid_y,
-                                                 self._grid_exporter.grid_z),
-                                                (self._xdim,
-                                                 self._ydim,
-                                                 self._zdim),
-                                                self._grid_exporter.ey_density)
-        self._ez_density = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
-                                                 self._grid_exporter.grid_y,
-                                                 self._grid_exporter.grid_z),
-                                                (self._xdim,
-                                                 self._ydim,
-                                                 self._zdim),
-                                                self._grid_exporter.ez_density)
+        # regrid the material IDs once and look up each property on them
+        self._mesh_data = dict()
+        for direction in self._grid_exporter.directions:
+            mat_ids = self._grid_exporter.mat_ids(direction)
+            mat_ids = xf_regrid_3d_nearest((self._grid_exporter.grid_x,
+                                            self._grid_exporter.grid_y,
+                                            self._grid_exporter.grid_z),
+                                           (self._xdim,
+                                            self._ydim,
+                                            self._zdim),
+                                           mat_ids)
+            for property_name in self._grid_exporter.direction_properties(
+                    direction, self._properties):
+                key = 'Mesh' + direction.capitalize() + \
+                      MESH_PROPERTY_KEYS[property_name]
+                self._mesh_data[key] = self._grid_exporter.mesh_property(
+                    direction, property_name, mat_ids)
 
     def savemat(self, file_name):
         """Export mesh/grid data to matlab file."""
         self._regrid()
         export_dict = dict()
-        if self._ex_density is not None:
-            print('Adding MeshExDensity to export mat file.')
-            print(np.shape(self._ex_density))
-            export_dict['MeshExDensity'] = self._ex_density
-        if self._ex_sigma is not None:
-            print('Adding MeshExSigma to export mat file.')
-            print(np.shape(self._ex_sigma))
-            export_dict['MeshExSigma'] = self._ex_sigma
-        if self._ex_epsilon_r is not None:
-            print('Adding MeshExEpsilon_r to export mat file.')
-            print(np.shape(self._ex_epsilon_r))
-            export_dict['MeshExEpsilon_r'] = self._ex_epsilon_r
-        if self._ey_density is not None:
-            print('Adding MeshEyDensity to export mat file.')
-            print(np.shape(self._ey_density))
-            export_dict['MeshEyDensity'] = self._ey_density
-        if self._ey_sigma is not None:
-            print('Adding MeshEySigma to export mat file.')
-            print(np.shape(self._ey_sigma))
-            export_dict['MeshEySigma'] = self._ey_sigma
-        if self._ey_epsilon_r is not None:
-            print('Adding MeshEyEpsilon_r to export mat file.')
-            print(np.shape(self._ey_epsilon_r))
-            export_dict['MeshEyEpsilon_r'] = self._ey_epsilon_r
-        if self._ez_density is not None:
-            print('Adding MeshEzDensity to export mat file.')
-            print(np.shape(self._ez_density))
-            export_dict['MeshEzDensity'] = self._ez_density
-        if self._ez_sigma is not None:
-            print('Adding MeshEzSigma to export mat file.')
-            print(np.shape(self._ez_sigma))
-            export_dict['MeshEzSigma'] = self._ez_sigma
-        if self._ez_epsilon_r is not None:
-            print('Adding MeshEzEpsilon_r to export mat file.')
-            print(np.shape(self._ez_epsilon_r))
-            export_dict['MeshEzEpsilon_r'] = self._ez_epsilon_r
-        if self._hx_density is not None:
-            print('Adding MeshHxDensity to export mat file.')
-            print(np.shape(self._hx_density))
-            export_dict['MeshHxDensity'] = self._hx_density
-        if self._hx_sigma is not None:
-            print('Adding MeshHxSigma to export mat file.')
-            print(np.shape(self._hx_sigma))
-            export_dict['MeshHxSigma'] = self._hx_sigma
-        if self._hy_density is not None:
-            print('Adding MeshHyDensity to export mat file.')
-            print(np.shape(self._hy_density))
-            export_dict['MeshHyDensity'] = self._hy_density
-        if self._hy_sigma is not None:
-            print('Adding MeshHySigma to export mat file.')
-            print(np.shape(self._hy_sigma))
-            export_dict['MeshHySigma'] = self._hy_sigma
-        if self._hz_density is not None:
-            print('Adding MeshHzDensity to export mat file.')
-            print(np.shape(self._hz_density))
-            export_dict['MeshHzDensity'] = self._hz_density
-        if self._hz_sigma is not None:
-            print('Adding MeshHzSigma to export mat file.')
-            print(np.shape(self._hz_sigma))
-            export_dict['MeshHzSigma'] = self._hz_sigma
+        for (key, values) in sorted(self._mesh_data.items()):
+            print('Adding ' + key + ' to export mat file.')
+            print(np.shape(values))
+            export_dict[key] = values
         if self._xdim is not None:
             print('Adding grid_X to export mat file.')
             export_dict['grid_X'] = [x*self._grid_exporter.units_scale_factor for x in self._xdim]
@@ -224,6 +121,12 @@ def usage(exit_status=None):
     print("  --lengths: dimensions of the ROI, centered at the origin, " + \
           "string prepresenting a Python list.")
     print("  --deltas: grid resolution, string representing a Python list.")
+    print("  --directions: edge directions to export, string representing " + \
+          "a Python list, default ['ex','ey','ez'].")
+    print("  --properties: mesh properties to export, string representing " + \
+          "a Python list, default ['density','sigma','epsilon_r'].")
+    print("  --cache_dir: on-disk cache of parsed geometry and decoded " + \
+          "mesh, default $XFMOD_CACHE_DIR.")
     print("")
     print("Example: ")
     print("  $ export_fields_uniform.py / --origin='[0.0,0.0,0.0]' \\" + \
@@ -239,7 +142,8 @@ def main(argv):
     arg_dict = {}
     switches = {'origin':list, 'lengths':list, 'deltas':list,
                 'xf_project':str, 'run':str, 'sim':str,
-                'export_file':str}
+                'export_file':str, 'directions':list, 'properties':list,
+                'cache_dir':str}
 
     singles = ''
     long_form = [x+'=' for x in switches]
@@ -289,7 +193,10 @@ def main(argv):
           "\n\tRunID: ", int(arg_dict['run']))
     xf_grid_writer = XFGridDataWriterUniform(arg_dict['xf_project'],
                                              int(arg_dict['sim']),
-                                             int(arg_dict['run']))
+                                             int(arg_dict['run']),
+                                             arg_dict.get('directions'),
+                                             arg_dict.get('properties'),
+                                             arg_dict.get('cache_dir'))
     xf_grid_writer.set_grid_origin(arg_dict['origin'][0],
                                    arg_dict['origin'][1],
                                    arg_dict['origin'][2])